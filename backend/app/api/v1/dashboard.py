@@ -1,14 +1,24 @@
-from fastapi import APIRouter, Depends
-from app.core.database import get_db
-from supabase import Client
+from fastapi import APIRouter, Depends, HTTPException
+from app.core.database import get_async_db
+from app.services.dashboard_counters import get_dashboard_counters
+from app.services.deadline_index import get_deadline_index
+from app.services.order_cache import get_order_list_cache
+from supabase import AsyncClient
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 @router.get("/stats")
-async def get_dashboard_stats(db: Client = Depends(get_db)):
-    """Obtiene estadísticas del dashboard"""
+async def get_dashboard_stats(db: AsyncClient = Depends(get_async_db)):
+    """Obtiene estadísticas del dashboard, desde los contadores en memoria si ya cargaron"""
+    counters = get_dashboard_counters()
+    if counters is not None and counters.loaded:
+        return counters.snapshot()
+    
     try:
-        result = db.table('dashboard_stats').select('*').execute()
+        result = await db.table('dashboard_stats').select('*').execute()
         if result.data and len(result.data) > 0:
             return result.data[0]
         return {
@@ -20,9 +30,22 @@ async def get_dashboard_stats(db: Client = Depends(get_db)):
             "avg_delay_hours": 0
         }
     except Exception as e:
-        return {
-            "error": str(e),
-            "orders_today": 0,
-            "orders_delayed": 0
-        }
+        # Un error no es un depósito vacío: no se responden ceros
+        logger.error(f"Error fetching dashboard stats: {e}")
+        raise HTTPException(status_code=503, detail="Dashboard stats unavailable")
+
+@router.get("/deadlines")
+async def get_deadline_index_stats():
+    """Estado del índice de plazos: órdenes abiertas, en riesgo, atrasadas y próximo evento"""
+    index = get_deadline_index()
+    if index is None:
+        return {"enabled": False}
+    return index.snapshot()
 
+@router.get("/cache")
+async def get_order_list_cache_stats():
+    """Estadísticas del cache de listados de órdenes (hits, misses, invalidaciones)"""
+    cache = get_order_list_cache()
+    if cache is None:
+        return {"enabled": False}
+    return cache.snapshot()
\ No newline at end of file
@@ -1,60 +1,110 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import List, Optional
+from fastapi.responses import ORJSONResponse
+from typing import Optional
 from uuid import UUID
 
-from app.core.database import get_db
-from app.services.order_service import OrderService
-from app.models.order import Order
-from app.models.enums import OrderStatus
+from app.core.database import get_async_db
+from app.services.order_service import AsyncOrderService
+from app.models.order import OrderDetail
+from app.models.enums import OrderStatus, Platform, ShippingType
 
 router = APIRouter()
 
-def get_order_service(db=Depends(get_db)):
-    return OrderService(db)
+def get_order_service(db=Depends(get_async_db)):
+    return AsyncOrderService(db)
 
-@router.get("/", response_model=List[dict])
+FIELDS_DESCRIPTION = "Columnas separadas por coma; por defecto las de la vista (sin raw_data)"
+
+async def _with_fields(listing):
+    """
+    Ejecuta un listado traduciendo un fields= inválido a 400. Las filas ya
+    vienen serializables desde PostgREST, así que van directo a orjson sin
+    pasar por jsonable_encoder; por eso estas rutas no declaran response_model.
+    """
+    try:
+        return ORJSONResponse(await listing)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/")
 async def get_all_orders(
-    limit: int = Query(100, le=500),
-    offset: int = Query(0, ge=0),
-    service: OrderService = Depends(get_order_service)
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    platform: Optional[Platform] = None,
+    status: Optional[OrderStatus] = None,
+    shipping_type: Optional[ShippingType] = None,
+    offset: int = Query(0, ge=0, description="Obsoleto: usar cursor"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    service: AsyncOrderService = Depends(get_order_service)
 ):
-    """Obtiene todas las órdenes"""
-    return service.get_all_orders(limit=limit, offset=offset)
+    """Obtiene todas las órdenes, paginadas por cursor ({items, next_cursor})"""
+    return await _with_fields(service.get_orders_page(
+        limit=limit,
+        cursor=cursor,
+        platform=platform.value if platform else None,
+        status=status.value if status else None,
+        shipping_type=shipping_type.value if shipping_type else None,
+        offset=offset,
+        fields=fields
+    ))
 
-@router.get("/today", response_model=List[dict])
-async def get_orders_today(service: OrderService = Depends(get_order_service)):
+@router.get("/today")
+async def get_orders_today(
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    service: AsyncOrderService = Depends(get_order_service)
+):
     """Órdenes del día - Vista PREVENTIVA"""
-    return service.get_orders_today()
+    return await _with_fields(service.get_orders_today(fields=fields))
 
-@router.get("/delayed", response_model=List[dict])
-async def get_delayed_orders(service: OrderService = Depends(get_order_service)):
+@router.get("/delayed")
+async def get_delayed_orders(
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    service: AsyncOrderService = Depends(get_order_service)
+):
     """Órdenes atrasadas - Vista REACTIVA"""
-    return service.get_delayed_orders()
+    return await _with_fields(service.get_delayed_orders(fields=fields))
 
-@router.get("/at-risk", response_model=List[dict])
-async def get_orders_at_risk(service: OrderService = Depends(get_order_service)):
+@router.get("/at-risk")
+async def get_orders_at_risk(
+    within_hours: Optional[float] = Query(None, gt=0, le=168, description="Por defecto RISK_HOURS_THRESHOLD"),
+    shipping_type: Optional[ShippingType] = None,
+    platform: Optional[Platform] = None,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    service: AsyncOrderService = Depends(get_order_service)
+):
     """Órdenes en riesgo (cerca del límite) - PREVENTIVO"""
-    return service.get_orders_at_risk()
+    return await _with_fields(service.get_orders_at_risk(
+        within_hours=within_hours,
+        platform=platform.value if platform else None,
+        shipping_type=shipping_type.value if shipping_type else None,
+        fields=fields
+    ))
 
-@router.get("/to-ship", response_model=List[dict])
-async def get_orders_to_ship(service: OrderService = Depends(get_order_service)):
+@router.get("/to-ship")
+async def get_orders_to_ship(
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    service: AsyncOrderService = Depends(get_order_service)
+):
     """Órdenes por enviar - Vista unificada con todas las pendientes"""
-    return service.get_orders_to_ship()
+    return await _with_fields(service.get_orders_to_ship(fields=fields))
 
-@router.get("/{order_id}")
+@router.get("/delivered")
+async def get_delivered_orders(
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    service: AsyncOrderService = Depends(get_order_service)
+):
+    """Órdenes entregadas"""
+    return await _with_fields(service.get_delivered_orders(fields=fields))
+
+@router.get("/{order_id}", response_model=OrderDetail)
 async def get_order(
     order_id: UUID,
-    service: OrderService = Depends(get_order_service)
+    service: AsyncOrderService = Depends(get_order_service)
 ):
-    """Obtiene una orden por ID"""
-    order = service.get_order_by_id(order_id)
+    """Obtiene una orden por ID, con raw_data"""
+    order = await service.get_order_by_id(order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
 
-@router.get("/delivered", response_model=List[dict])
-async def get_delivered_orders(service: OrderService = Depends(get_order_service)):
-    """Órdenes entregadas"""
-    return service.get_delivered_orders()
-
 
@@ -1,51 +1,192 @@
-from fastapi import APIRouter, Depends, BackgroundTasks, Query
+from fastapi import APIRouter, Depends, Query, HTTPException
+from typing import List, Optional
+from datetime import datetime, timezone
+from uuid import UUID
 from app.core.database import get_db
-from app.services.sync_service import SyncService
+from app.services.sync_cursor_service import SyncCursorService
+from app.services.sync_job_service import SyncJobRunner, get_sync_job_runner
+from app.services.order_outbox import get_order_outbox
+from app.services.backfill_service import BackfillRunner, BackfillService, get_backfill_runner
+from app.config import get_settings
+from app.core.scheduler import get_scheduled_jobs
+from app.models.enums import Platform
 from supabase import Client
 
 router = APIRouter()
 
-@router.post("/all")
+# Los endpoints de backfill y cursores usan el cliente sync de Supabase: son
+# def y no async def para que FastAPI los corra en su threadpool y no
+# bloqueen el event loop
+
+def get_job_runner():
+    return get_sync_job_runner()
+
+def _queued_response(job, message: str) -> dict:
+    return {
+        "message": message,
+        "job_id": str(job.id),
+        "status": job.status.value,
+        "status_url": f"/api/v1/sync/jobs/{job.id}"
+    }
+
+@router.post("/all", status_code=202)
 async def sync_all_platforms(
-    background_tasks: BackgroundTasks,
     only_pending: bool = Query(True, description="Solo sincronizar órdenes pendientes"),
-    db: Client = Depends(get_db)
+    full_resync: bool = Query(False, description="Ignorar el cursor y resincronizar la ventana inicial"),
+    runner: SyncJobRunner = Depends(get_job_runner)
 ):
-    """Sincroniza todas las plataformas"""
-    sync_service = SyncService(db)
-    
-    def sync_task():
-        return sync_service.sync_all_platforms(only_pending=only_pending)
-    
-    result = sync_task()
+    """Encola un sync de todas las plataformas y retorna el ID del job"""
+    job = runner.submit('all', only_pending=only_pending, full_resync=full_resync)
+    return _queued_response(job, "Sync queued")
+
+@router.post("/falabella", status_code=202)
+async def sync_falabella(
+    only_pending: bool = Query(True, description="Solo sincronizar órdenes pendientes"),
+    full_resync: bool = Query(False, description="Ignorar el cursor y resincronizar la ventana inicial"),
+    runner: SyncJobRunner = Depends(get_job_runner)
+):
+    """Encola un sync de Falabella"""
+    job = runner.submit('falabella', only_pending=only_pending, full_resync=full_resync)
+    return _queued_response(job, "Falabella sync queued")
+
+@router.post("/mercadolibre", status_code=202)
+async def sync_mercadolibre(
+    only_pending: bool = Query(True, description="Solo sincronizar órdenes pendientes"),
+    full_resync: bool = Query(False, description="Ignorar el cursor y resincronizar la ventana inicial"),
+    runner: SyncJobRunner = Depends(get_job_runner)
+):
+    """Encola un sync de MercadoLibre"""
+    job = runner.submit('mercadolibre', only_pending=only_pending, full_resync=full_resync)
+    return _queued_response(job, "MercadoLibre sync queued")
+
+@router.get("/jobs", response_model=List[dict])
+async def get_sync_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    runner: SyncJobRunner = Depends(get_job_runner)
+):
+    """Últimos jobs de sincronización"""
+    return runner.get_recent_jobs(limit=limit)
+
+@router.get("/jobs/{job_id}")
+async def get_sync_job(
+    job_id: UUID,
+    runner: SyncJobRunner = Depends(get_job_runner)
+):
+    """Estado y avance por plataforma de un job de sincronización"""
+    job = runner.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Sync job not found")
+    return job
+
+@router.get("/schedule", response_model=List[dict])
+async def get_sync_schedule():
+    """Syncs programados por el scheduler interno"""
+    return get_scheduled_jobs()
+
+@router.get("/outbox")
+def get_outbox_metrics():
+    """Profundidad, lag y contadores del outbox local de órdenes"""
+    outbox = get_order_outbox()
+    if outbox is None:
+        return {"enabled": False}
+    return outbox.metrics()
+
+@router.post("/outbox/retry")
+def retry_outbox_dead():
+    """Reencola las órdenes del outbox que agotaron sus reintentos"""
+    outbox = get_order_outbox()
+    if outbox is None:
+        raise HTTPException(status_code=404, detail="Order outbox is disabled")
+    return {
+        "message": "Dead outbox orders requeued",
+        "requeued": outbox.retry_dead()
+    }
+
+@router.post("/backfill", status_code=202)
+def start_backfill(
+    start: datetime = Query(..., description="Inicio del rango (fecha de creación de las órdenes)"),
+    end: Optional[datetime] = Query(None, description="Fin del rango; por defecto ahora"),
+    platforms: Optional[List[Platform]] = Query(None, description="Por defecto todas"),
+    window_hours: Optional[int] = Query(None, ge=1, le=24 * 31, description="Tamaño de cada ventana"),
+    runner: BackfillRunner = Depends(get_backfill_runner)
+):
+    """Encola un backfill histórico partido en ventanas con checkpoint"""
+    end = end or datetime.now(timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
     
+    backfill = runner.start(
+        platforms or list(Platform),
+        start,
+        end,
+        window_hours or get_settings().BACKFILL_WINDOW_HOURS
+    )
+    if not backfill:
+        raise HTTPException(status_code=500, detail="Could not create backfill")
     return {
-        "message": "Sync completed",
-        "result": result
+        "message": "Backfill queued",
+        "backfill_id": str(backfill['id']),
+        "status_url": f"/api/v1/sync/backfill/{backfill['id']}"
     }
 
-@router.post("/falabella")
-async def sync_falabella(
-    only_pending: bool = Query(True, description="Solo sincronizar órdenes pendientes"),
+@router.get("/backfill", response_model=List[dict])
+def get_backfills(
+    limit: int = Query(20, ge=1, le=100),
     db: Client = Depends(get_db)
 ):
-    """Sincroniza solo Falabella"""
-    sync_service = SyncService(db)
-    result = sync_service.sync_falabella(only_pending=only_pending)
+    """Últimos backfills"""
+    return BackfillService(db).get_backfills(limit=limit)
+
+@router.get("/backfill/{backfill_id}")
+def get_backfill(
+    backfill_id: UUID,
+    db: Client = Depends(get_db),
+    runner: BackfillRunner = Depends(get_backfill_runner)
+):
+    """Avance en vivo (si corre en este proceso) y checkpoints de un backfill"""
+    service = BackfillService(db)
+    backfill = service.get_backfill(backfill_id)
+    if not backfill:
+        raise HTTPException(status_code=404, detail="Backfill not found")
+    windows = service.get_windows(backfill_id)
     return {
-        "message": "Falabella sync completed",
-        "result": result
+        **backfill,
+        "progress": runner.get_progress(backfill_id),
+        "windows_completed": sum(1 for window in windows if window['status'] == 'completed'),
+        "windows_failed": [window for window in windows if window['status'] != 'completed']
     }
 
-@router.post("/mercadolibre")
-async def sync_mercadolibre(
-    only_pending: bool = Query(True, description="Solo sincronizar órdenes pendientes"),
+@router.post("/backfill/{backfill_id}/resume", status_code=202)
+def resume_backfill(
+    backfill_id: UUID,
+    db: Client = Depends(get_db),
+    runner: BackfillRunner = Depends(get_backfill_runner)
+):
+    """Reanuda un backfill desde su último checkpoint"""
+    if not BackfillService(db).get_backfill(backfill_id):
+        raise HTTPException(status_code=404, detail="Backfill not found")
+    if not runner.resume(backfill_id):
+        raise HTTPException(status_code=409, detail="Backfill is already queued or running")
+    return {
+        "message": "Backfill resumed",
+        "backfill_id": str(backfill_id),
+        "status_url": f"/api/v1/sync/backfill/{backfill_id}"
+    }
+
+@router.get("/cursors")
+def get_sync_cursors(db: Client = Depends(get_db)):
+    """Cursores de sincronización incremental por plataforma"""
+    return SyncCursorService(db).get_all_cursors()
+
+@router.delete("/cursors/{platform}")
+def reset_sync_cursor(
+    platform: Platform,
+    scope: Optional[str] = Query(None, description="pending o full; por defecto ambos"),
     db: Client = Depends(get_db)
 ):
-    """Sincroniza solo MercadoLibre"""
-    sync_service = SyncService(db)
-    result = sync_service.sync_mercadolibre(only_pending=only_pending)
+    """Borra el cursor de una plataforma para forzar una resincronización completa"""
+    if not SyncCursorService(db).reset_cursor(platform, scope):
+        raise HTTPException(status_code=500, detail="Could not reset sync cursor")
     return {
-        "message": "MercadoLibre sync completed",
-        "result": result
-    }
\ No newline at end of file
+        "message": f"{platform.value} sync cursor reset"
+    }
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, HTTPException
+from app.models.notification import MeliNotification
+from app.services.meli_notification_service import get_meli_notification_queue
+
+router = APIRouter()
+
+@router.post("/mercadolibre")
+async def receive_meli_notification(notification: MeliNotification):
+    """
+    Webhook de notificaciones de MercadoLibre.
+    Solo encola el recurso y responde 200 de inmediato, como exige ML.
+    """
+    queue = get_meli_notification_queue()
+    if queue is None:
+        raise HTTPException(status_code=404, detail="MercadoLibre webhook is disabled")
+    return {"status": queue.enqueue(notification)}
+
+@router.get("/mercadolibre/stats")
+async def get_meli_notification_stats():
+    """Estado de la cola de notificaciones de MercadoLibre"""
+    queue = get_meli_notification_queue()
+    if queue is None:
+        return {"enabled": False}
+    return queue.metrics()
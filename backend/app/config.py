@@ -3,6 +3,7 @@
 # =====================================================
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 class Settings(BaseSettings):
     APP_NAME: str = "Sistema Logística Unificado"
@@ -15,13 +16,69 @@ class Settings(BaseSettings):
     FALABELLA_API_KEY: str
     FALABELLA_USER_ID: str
     FALABELLA_BASE_URL: str = "https://sellercenter-api.falabella.com"
+    FALABELLA_PAGE_SIZE: int = 100
+    FALABELLA_MAX_WORKERS: int = 4
+    FALABELLA_RATE_LIMIT_PER_SECOND: float = 4.0
+    FALABELLA_RATE_LIMIT_BURST: int = 8
+    FALABELLA_FETCH_ORDER_ITEMS: bool = True
+    FALABELLA_ORDER_ITEMS_CHUNK_SIZE: int = 100
     
     MELI_ACCESS_TOKEN: str
     MELI_USER_ID: str
     MELI_BASE_URL: str = "https://api.mercadolibre.com"
+    MELI_SHIPMENT_WORKERS: int = 8
+    MELI_RATE_LIMIT_PER_SECOND: float = 15.0
+    MELI_RATE_LIMIT_BURST: int = 20
+    MELI_SHIPMENT_CACHE_TTL_SECONDS: int = 3600
+    MELI_SHIPMENT_CACHE_MAX_ENTRIES: int = 20000
+    MELI_SHIPMENT_CACHE_TERMINAL_MAX_ENTRIES: int = 50000
+    MELI_WEBHOOK_ENABLED: bool = True
+    MELI_NOTIFICATION_COALESCE_SECONDS: float = 5.0
+    MELI_NOTIFICATION_BATCH_SIZE: int = 20
+    MELI_NOTIFICATION_MAX_PENDING: int = 10000
+    
+    HTTP_POOL_SIZE: int = 20
+    HTTP_TIMEOUT_SECONDS: float = 30.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 10.0
+    HTTP_KEEPALIVE_SECONDS: float = 60.0
+    HTTP2_ENABLED: bool = True
+    HTTP_MAX_RETRIES: int = 4
+    HTTP_BACKOFF_BASE_SECONDS: float = 0.5
+    HTTP_BACKOFF_MAX_SECONDS: float = 30.0
     
     SYNC_INTERVAL_HOURS: int = 2
+    SCHEDULER_ENABLED: bool = True
+    FALABELLA_SYNC_INTERVAL_MINUTES: Optional[int] = None
+    MELI_SYNC_INTERVAL_MINUTES: Optional[int] = 30
+    SCHEDULER_JITTER_SECONDS: int = 60
+    SCHEDULER_MISFIRE_GRACE_SECONDS: int = 300
+    SCHEDULER_STARTUP_DELAY_SECONDS: int = 30
+    ORDER_UPSERT_CHUNK_SIZE: int = 500
+    SYNC_PIPELINE_QUEUE_PAGES: int = 4
+    SYNC_INITIAL_WINDOW_DAYS: int = 7
+    SYNC_CURSOR_OVERLAP_MINUTES: int = 5
+    SYNC_JOB_WORKERS: int = 2
+    SYNC_JOB_HISTORY_SIZE: int = 50
+    BACKFILL_WINDOW_HOURS: int = 24
+    BACKFILL_WINDOW_WORKERS: int = 2
+    ORDER_OUTBOX_ENABLED: bool = True
+    ORDER_OUTBOX_PATH: str = "data/order_outbox.db"
+    ORDER_OUTBOX_BATCH_SIZE: int = 1000
+    ORDER_OUTBOX_FLUSH_INTERVAL_SECONDS: float = 2.0
+    ORDER_OUTBOX_MAX_ATTEMPTS: int = 10
+    ORDER_OUTBOX_SYNC_WAIT_SECONDS: float = 120.0
     RISK_HOURS_THRESHOLD: int = 6
+    DEADLINE_INDEX_ENABLED: bool = True
+    DEADLINE_FLUSH_SECONDS: float = 30.0
+    ORDER_LIST_CACHE_ENABLED: bool = True
+    ORDER_LIST_CACHE_TTL_SECONDS: float = 15.0
+    ORDER_LIST_CACHE_MAX_ENTRIES: int = 256
+    DASHBOARD_COUNTERS_ENABLED: bool = True
+    DASHBOARD_RECONCILE_SECONDS: float = 600.0
+    DASHBOARD_TIMEZONE: str = "America/Santiago"
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    GZIP_COMPRESSION_LEVEL: int = 6
+    BROTLI_QUALITY: int = 4
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,162 @@
+from typing import Callable, Dict, Optional
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import brotli
+import zlib
+
+# Desde este tamaño el body se comprime en un thread (zlib y brotli sueltan el
+# GIL) para no frenar el event loop con un listado de varios MB
+THREADPOOL_MINIMUM_SIZE = 256 * 1024
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        # wbits=31: deflate con cabecera y trailer gzip
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)
+    
+    def flush(self) -> bytes:
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+    
+    def finish(self) -> bytes:
+        return self.compressor.flush(zlib.Z_FINISH)
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        self.compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=quality)
+    
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data)
+    
+    def flush(self) -> bytes:
+        return self.compressor.flush()
+    
+    def finish(self) -> bytes:
+        return self.compressor.finish()
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """'br', 'gzip' o None según Accept-Encoding; br gana si el cliente acepta ambos"""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip()] = quality
+    
+    wildcard = accepted.get('*', 0.0)
+    best = None
+    for encoding in ('br', 'gzip'):
+        quality = accepted.get(encoding, wildcard)
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (encoding, quality)
+    return best[0] if best else None
+
+class CompressionMiddleware:
+    """
+    Comprime las respuestas con brotli o gzip según lo que acepte el cliente.
+    
+    Los listados de órdenes son JSON muy repetitivo (mismas claves en cada
+    fila) y se comprimen a una fracción de su tamaño. Las respuestas menores
+    a minimum_size y las que ya traen Content-Encoding salen tal cual.
+    """
+    
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoders: Dict[str, Callable] = {
+            'br': lambda: _BrotliEncoder(brotli_quality),
+            'gzip': lambda: _GzipEncoder(gzip_level)
+        }
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] == 'http':
+            encoding = negotiate_encoding(Headers(scope=scope).get('accept-encoding', ''))
+            if encoding:
+                responder = _CompressionResponder(self.app, encoding, self.encoders[encoding], self.minimum_size)
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+class _CompressionResponder:
+    """Una respuesta: retiene el inicio hasta ver el primer bloque del body"""
+    
+    def __init__(self, app: ASGIApp, encoding: str, encoder_factory: Callable, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.encoder_factory = encoder_factory
+        self.minimum_size = minimum_size
+        self.send: Optional[Send] = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+        self.encoder = None
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+    
+    def _set_headers(self, length: Optional[int]) -> None:
+        headers = MutableHeaders(raw=self.initial_message['headers'])
+        headers['Content-Encoding'] = self.encoding
+        if length is None:
+            del headers['Content-Length']
+        else:
+            headers['Content-Length'] = str(length)
+        headers.add_vary_header('Accept-Encoding')
+    
+    def _compress_all(self, body: bytes) -> bytes:
+        return self.encoder.compress(body) + self.encoder.finish()
+    
+    async def send_compressed(self, message: Message) -> None:
+        message_type = message['type']
+        if message_type == 'http.response.start':
+            self.initial_message = message
+            self.passthrough = 'content-encoding' in Headers(raw=message['headers'])
+            return
+        if message_type != 'http.response.body':
+            await self.send(message)
+            return
+        
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+        
+        if self.passthrough:
+            if not self.started:
+                self.started = True
+                await self.send(self.initial_message)
+            await self.send(message)
+            return
+        
+        if not self.started:
+            self.started = True
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+            
+            self.encoder = self.encoder_factory()
+            if not more_body:
+                if len(body) >= THREADPOOL_MINIMUM_SIZE:
+                    body = await run_in_threadpool(self._compress_all, body)
+                else:
+                    body = self._compress_all(body)
+                self._set_headers(len(body))
+            else:
+                # Streaming: cada bloque se envía comprimido sin esperar al resto
+                body = self.encoder.compress(body) + self.encoder.flush()
+                self._set_headers(None)
+            await self.send(self.initial_message)
+            await self.send({'type': 'http.response.body', 'body': body, 'more_body': more_body})
+            return
+        
+        body = self.encoder.compress(body) + (self.encoder.flush() if more_body else self.encoder.finish())
+        await self.send({'type': 'http.response.body', 'body': body, 'more_body': more_body})
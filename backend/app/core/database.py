@@ -1,6 +1,7 @@
-from supabase import create_client, Client
+from supabase import create_client, acreate_client, AsyncClient, AsyncClientOptions, Client
 from app.config import get_settings
 from typing import Optional
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,4 +21,41 @@ class SupabaseClient:
         return cls._instance
 
 def get_db() -> Client:
-    return SupabaseClient.get_client()
\ No newline at end of file
+    return SupabaseClient.get_client()
+
+class AsyncSupabaseClient:
+    """
+    Cliente async de Supabase para los endpoints. Es uno solo por proceso,
+    así todas las requests comparten el pool de conexiones de PostgREST.
+    """
+    _instance: Optional[AsyncClient] = None
+    _lock: Optional[asyncio.Lock] = None
+    
+    @classmethod
+    async def get_client(cls) -> AsyncClient:
+        if cls._instance is None:
+            if cls._lock is None:
+                cls._lock = asyncio.Lock()
+            async with cls._lock:
+                if cls._instance is None:
+                    settings = get_settings()
+                    cls._instance = await acreate_client(
+                        settings.SUPABASE_URL,
+                        settings.SUPABASE_KEY,
+                        options=AsyncClientOptions(postgrest_client_timeout=settings.HTTP_TIMEOUT_SECONDS)
+                    )
+                    logger.info("Async Supabase client initialized")
+        return cls._instance
+    
+    @classmethod
+    async def close(cls) -> None:
+        if cls._instance is not None:
+            await cls._instance.postgrest.aclose()
+            cls._instance = None
+            cls._lock = None
+
+async def get_async_db() -> AsyncClient:
+    return await AsyncSupabaseClient.get_client()
+
+async def close_async_db() -> None:
+    await AsyncSupabaseClient.close()
@@ -0,0 +1,83 @@
+# =====================================================
+# backend/app/core/scheduler.py
+# =====================================================
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+from apscheduler.schedulers.background import BackgroundScheduler
+from app.config import get_settings
+from app.models.enums import Platform
+from app.services.sync_job_service import get_sync_job_runner
+import logging
+
+logger = logging.getLogger(__name__)
+
+_scheduler: Optional[BackgroundScheduler] = None
+
+def run_scheduled_sync(platform: Platform) -> None:
+    """Sync incremental de una plataforma, registrado como job del runner"""
+    job = get_sync_job_runner().run(platform.value, trigger='scheduler', only_pending=True)
+    logger.info(f"Scheduled {platform.value} sync finished: {job.status.value}")
+
+def start_scheduler() -> Optional[BackgroundScheduler]:
+    """
+    Programa un sync incremental por plataforma, cada una con su intervalo.
+    
+    max_instances=1 evita que un sync programado se solape consigo mismo y
+    SyncService bloquea por plataforma, así tampoco choca con un sync manual.
+    Con varios workers de uvicorn cada proceso tendría su scheduler: habilitar
+    SCHEDULER_ENABLED solo en uno.
+    """
+    global _scheduler
+    settings = get_settings()
+    if not settings.SCHEDULER_ENABLED or _scheduler is not None:
+        return _scheduler
+    
+    default_minutes = settings.SYNC_INTERVAL_HOURS * 60
+    intervals = {
+        Platform.FALABELLA: settings.FALABELLA_SYNC_INTERVAL_MINUTES or default_minutes,
+        Platform.MERCADOLIBRE: settings.MELI_SYNC_INTERVAL_MINUTES or default_minutes,
+    }
+    
+    _scheduler = BackgroundScheduler(
+        job_defaults={
+            'coalesce': True,
+            'max_instances': 1,
+            'misfire_grace_time': settings.SCHEDULER_MISFIRE_GRACE_SECONDS
+        }
+    )
+    
+    first_run = datetime.now() + timedelta(seconds=settings.SCHEDULER_STARTUP_DELAY_SECONDS)
+    for platform, minutes in intervals.items():
+        _scheduler.add_job(
+            run_scheduled_sync,
+            'interval',
+            args=[platform],
+            id=f"sync_{platform.value}",
+            minutes=minutes,
+            jitter=settings.SCHEDULER_JITTER_SECONDS,
+            next_run_time=first_run
+        )
+        logger.info(f"Scheduled {platform.value} sync every {minutes} minutes")
+    
+    _scheduler.start()
+    return _scheduler
+
+def get_scheduled_jobs() -> List[Dict]:
+    """Syncs programados y su próxima ejecución"""
+    if _scheduler is None:
+        return []
+    return [
+        {
+            'id': job.id,
+            'next_run_time': job.next_run_time.isoformat() if job.next_run_time else None,
+            'trigger': str(job.trigger)
+        }
+        for job in _scheduler.get_jobs()
+    ]
+
+def shutdown_scheduler() -> None:
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.shutdown(wait=False)
+        _scheduler = None
+        logger.info("Scheduler stopped")
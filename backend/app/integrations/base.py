@@ -1,16 +1,201 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from typing import Callable, Iterator, List, Dict, Optional
+from importlib.util import find_spec
+from datetime import datetime
+from app.config import get_settings
 from app.models.enums import Platform
+from .rate_limiter import RateLimiter, parse_retry_after
+import httpx
+import random
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+class PlatformAPIError(Exception):
+    """Error de la API de una plataforma después de agotar los reintentos"""
+    
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class HttpTransport:
+    """
+    Cliente HTTP de larga vida compartido por todas las integraciones.
+    
+    Mantiene un pool de conexiones keep-alive (HTTP/2 si el paquete h2 está
+    instalado), así el costo de TCP+TLS se paga una vez por proceso.
+    """
+    
+    def __init__(
+        self,
+        pool_size: int = 20,
+        timeout: float = 30.0,
+        connect_timeout: float = 10.0,
+        keepalive_expiry: float = 60.0,
+        http2: bool = True
+    ):
+        self.http2 = http2 and find_spec('h2') is not None
+        self.client = httpx.Client(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=keepalive_expiry
+            ),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout)
+        )
+        logger.info(f"HTTP transport initialized (pool={pool_size}, http2={self.http2})")
+    
+    def get(self, url: str, **kwargs) -> httpx.Response:
+        return self.client.get(url, **kwargs)
+    
+    def close(self) -> None:
+        self.client.close()
+        logger.info("HTTP transport closed")
+
+_transport: Optional[HttpTransport] = None
+_transport_lock = threading.Lock()
+
+def get_http_transport() -> HttpTransport:
+    """Transport compartido del proceso, creado con la configuración la primera vez"""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                settings = get_settings()
+                _transport = HttpTransport(
+                    pool_size=settings.HTTP_POOL_SIZE,
+                    timeout=settings.HTTP_TIMEOUT_SECONDS,
+                    connect_timeout=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+                    keepalive_expiry=settings.HTTP_KEEPALIVE_SECONDS,
+                    http2=settings.HTTP2_ENABLED
+                )
+    return _transport
+
+def close_http_transport() -> None:
+    """Cierra el transport compartido (shutdown de la app)"""
+    global _transport
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+            _transport = None
+
 class BasePlatformIntegration(ABC):
     """Clase base para todas las integraciones de plataformas"""
     
-    def __init__(self, platform: Platform):
+    def __init__(
+        self,
+        platform: Platform,
+        transport: Optional[HttpTransport] = None,
+        rate_limiter: Optional[RateLimiter] = None
+    ):
         self.platform = platform
+        self.transport = transport or get_http_transport()
+        self.rate_limiter = rate_limiter
+        
+        settings = get_settings()
+        self.max_retries = settings.HTTP_MAX_RETRIES
+        self.backoff_base = settings.HTTP_BACKOFF_BASE_SECONDS
+        self.backoff_max = settings.HTTP_BACKOFF_MAX_SECONDS
         self.logger = logging.getLogger(f"{__name__}.{platform.value}")
+        # Errores de la última descarga; si hay alguno la descarga quedó incompleta
+        self.fetch_errors: List[str] = []
+        # Callback opcional que recibe el tamaño de cada página descargada
+        self.on_page: Optional[Callable[[int], None]] = None
+    
+    def _backoff_delay(self, attempt: int) -> float:
+        """Backoff exponencial con jitter para el intento attempt (0, 1, 2...)"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.5)
+    
+    def _get(self, url: str, **kwargs) -> httpx.Response:
+        """
+        GET a través del transport respetando el rate limiter de la plataforma.
+        
+        Un 429 pausa el limitador según Retry-After (o backoff si no viene) y
+        reintenta; 5xx y errores de red se reintentan con backoff exponencial
+        con jitter. Agotados los reintentos levanta PlatformAPIError, nunca
+        devuelve una respuesta de error como si estuviera vacía.
+        """
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self.transport.get(url, **kwargs)
+            except httpx.TransportError as e:
+                if last_attempt:
+                    raise PlatformAPIError(f"{self.platform.value} request failed: {e}") from e
+                self.logger.warning(f"Network error on {url}, retrying: {e}")
+                self._record_retry()
+                time.sleep(self._backoff_delay(attempt))
+                continue
+            
+            if response.status_code == 429:
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if retry_after is None:
+                    retry_after = self._backoff_delay(attempt)
+                if self.rate_limiter:
+                    self.rate_limiter.on_throttled(retry_after)
+                if last_attempt:
+                    raise PlatformAPIError(f"{self.platform.value} rate limit exceeded", 429)
+                self._record_retry()
+                if not self.rate_limiter:
+                    time.sleep(retry_after)
+                continue
+            
+            if response.status_code >= 500:
+                if last_attempt:
+                    raise PlatformAPIError(
+                        f"{self.platform.value} returned {response.status_code}: {response.text[:200]}",
+                        response.status_code
+                    )
+                self.logger.warning(f"{response.status_code} from {url}, retrying")
+                self._record_retry()
+                time.sleep(self._backoff_delay(attempt))
+                continue
+            
+            if response.status_code >= 400:
+                raise PlatformAPIError(
+                    f"{self.platform.value} returned {response.status_code}: {response.text[:200]}",
+                    response.status_code
+                )
+            
+            if self.rate_limiter:
+                self.rate_limiter.on_success()
+            return response
+    
+    def _page_fetched(self, count: int) -> None:
+        if self.on_page:
+            self.on_page(count)
+    
+    def _record_retry(self) -> None:
+        if self.rate_limiter:
+            self.rate_limiter.on_retry()
+    
+    def throttle_state(self) -> Optional[Dict]:
+        """Estado del rate limiter de la plataforma"""
+        return self.rate_limiter.snapshot() if self.rate_limiter else None
+    
+    @abstractmethod
+    def sync_window(self, updated_after: Optional[datetime], initial_window_days: int) -> Dict:
+        """
+        kwargs de fetch_orders para un sync incremental: órdenes modificadas
+        desde updated_after o, si es None, la ventana inicial de días.
+        """
+        pass
+    
+    @abstractmethod
+    def backfill_window(self, start: datetime, end: datetime) -> Dict:
+        """kwargs de fetch_orders para las órdenes creadas entre start y end"""
+        pass
+    
+    def fetch_report(self) -> Dict:
+        """Datos extra de la última descarga para el resultado del sync"""
+        return {}
     
     @abstractmethod
     def fetch_orders(self, **kwargs) -> List[Dict]:
@@ -22,6 +207,16 @@ class BasePlatformIntegration(ABC):
         """Mapea la orden de la plataforma al formato estándar"""
         pass
     
+    def iter_order_pages(self, **kwargs) -> Iterator[List[Dict]]:
+        """Páginas de órdenes crudas; por defecto todo fetch_orders como una sola página"""
+        yield self.fetch_orders(**kwargs)
+    
+    def iter_fetched_pages(self, only_pending: bool = True, **kwargs) -> Iterator[List[Dict]]:
+        """Igual que iter_order_pages pero informando cada página a on_page"""
+        for page in self.iter_order_pages(only_pending=only_pending, **kwargs):
+            self._page_fetched(len(page))
+            yield page
+    
     def get_orders_standardized(self, only_pending: bool = True, **kwargs) -> List[Dict]:
         """Obtiene y mapea órdenes al formato estándar"""
         try:
@@ -1,18 +1,41 @@
-import requests
 import hashlib
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-from .base import BasePlatformIntegration
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from itertools import islice
+from typing import Iterator, List, Dict, Optional, Tuple
+from .base import BasePlatformIntegration, HttpTransport, PlatformAPIError
+from .rate_limiter import get_rate_limiter
 from app.models.enums import Platform, ShippingType
 from app.utils.status_mapper import StatusMapper
 from app.utils.date_helpers import parse_iso_date
 
 class FalabellaIntegration(BasePlatformIntegration):
-    def __init__(self, api_key: str, user_id: str, base_url: str):
-        super().__init__(Platform.FALABELLA)
+    def __init__(
+        self,
+        api_key: str,
+        user_id: str,
+        base_url: str,
+        transport: Optional[HttpTransport] = None,
+        rate_limit_per_second: float = 4.0,
+        rate_limit_burst: int = 8,
+        page_size: int = 100,
+        max_workers: int = 4,
+        fetch_order_items: bool = True,
+        order_items_chunk_size: int = 100
+    ):
+        super().__init__(
+            Platform.FALABELLA,
+            transport,
+            get_rate_limiter(Platform.FALABELLA.value, user_id, rate_limit_per_second, rate_limit_burst)
+        )
         self.api_key = api_key
         self.user_id = user_id
         self.base_url = base_url
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.fetch_order_items = fetch_order_items
+        self.order_items_chunk_size = max(1, order_items_chunk_size)
+        self.item_errors: List[Dict] = []
     
     def _generate_signature(self, params: dict) -> str:
         """Genera la firma según la documentación de Falabella"""
@@ -30,29 +53,34 @@ class FalabellaIntegration(BasePlatformIntegration):
         signature = hashlib.sha256(to_sign.encode('utf-8')).hexdigest()
         return signature
     
-    def fetch_orders(
-        self, 
-        created_after: Optional[str] = None,
-        limit: int = 100,
-        offset: int = 0,
-        only_pending: bool = True
-    ) -> List[Dict]:
-        """Obtiene órdenes de Falabella"""
+    def _build_params(self, action: str) -> Dict:
+        """Arma los parámetros base firmados para una acción"""
         timestamp = datetime.utcnow().isoformat() + 'Z'
         
         params = {
             'UserID': self.user_id,
             'Version': '1.0',
-            'Action': 'GetOrders',
+            'Action': action,
             'Format': 'JSON',
-            'Timestamp': timestamp,
-            'Limit': str(limit),
-            'Offset': str(offset)
+            'Timestamp': timestamp
         }
         
-        # Generar firma ANTES de agregar otros parámetros opcionales
-        signature = self._generate_signature(params)
-        params['Signature'] = signature
+        params['Signature'] = self._generate_signature(params)
+        return params
+    
+    def _fetch_orders_page(
+        self,
+        offset: int,
+        limit: int,
+        only_pending: bool,
+        created_after: Optional[str],
+        updated_after: Optional[str] = None,
+        created_before: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[int]]:
+        """Obtiene una página de órdenes y el total informado por la API"""
+        params = self._build_params('GetOrders')
+        params['Limit'] = str(limit)
+        params['Offset'] = str(offset)
         
         # Agregar filtros opcionales DESPUÉS de la firma
         if only_pending:
@@ -61,34 +89,294 @@ class FalabellaIntegration(BasePlatformIntegration):
         if created_after:
             params['CreatedAfter'] = created_after
         
+        if created_before:
+            params['CreatedBefore'] = created_before
+        
+        if updated_after:
+            params['UpdatedAfter'] = updated_after
+        
+        self.logger.info(f"Requesting Falabella orders page offset={offset} limit={limit}")
+        
+        response = self._get(
+            f"{self.base_url}",
+            params=params,
+            timeout=30
+        )
+        
+        self.logger.info(f"Falabella response status: {response.status_code} (offset={offset})")
+        
+        data = response.json()
+        if 'ErrorResponse' in data:
+            head = data['ErrorResponse'].get('Head', {})
+            raise PlatformAPIError(
+                f"Falabella error {head.get('ErrorCode')}: {head.get('ErrorMessage')}"
+            )
+        payload = data.get('SuccessResponse', data)
+        
+        orders = payload.get('Body', {}).get('Orders', {}).get('Order', [])
+        if isinstance(orders, dict):
+            orders = [orders]
+        
+        total_count = payload.get('Head', {}).get('TotalCount')
         try:
-            self.logger.info(f"Requesting Falabella orders with params: {params}")
-            
-            response = requests.get(
-                f"{self.base_url}",
-                params=params,
-                timeout=30
+            total_count = int(total_count) if total_count is not None else None
+        except (TypeError, ValueError):
+            total_count = None
+        
+        return orders, total_count
+    
+    def _fetch_order_items_chunk(self, order_ids: List[str]) -> Dict[str, List[Dict]]:
+        """Items de varias órdenes en un solo GetMultipleOrderItems"""
+        params = self._build_params('GetMultipleOrderItems')
+        params['OrderIdList'] = f"[{','.join(order_ids)}]"
+        
+        response = self._get(f"{self.base_url}", params=params, timeout=30)
+        data = response.json()
+        if 'ErrorResponse' in data:
+            head = data['ErrorResponse'].get('Head', {})
+            raise PlatformAPIError(
+                f"Falabella error {head.get('ErrorCode')}: {head.get('ErrorMessage')}"
             )
-            
-            self.logger.info(f"Falabella response status: {response.status_code}")
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            orders = data.get('Body', {}).get('Orders', {}).get('Order', [])
-            if isinstance(orders, dict):
-                orders = [orders]
-            
-            self.logger.info(f"Fetched {len(orders)} orders from Falabella")
+        payload = data.get('SuccessResponse', data)
+        
+        orders = payload.get('Body', {}).get('Orders', {}).get('Order', [])
+        if isinstance(orders, dict):
+            orders = [orders]
+        
+        items_by_order = {}
+        for order in orders:
+            items = (order.get('OrderItems') or {}).get('OrderItem', [])
+            if isinstance(items, dict):
+                items = [items]
+            items_by_order[str(order.get('OrderId'))] = items
+        return items_by_order
+    
+    def _attach_order_items(self, orders: List[Dict]) -> List[Dict]:
+        """
+        Agrega OrderItems a cada orden de una página con GetMultipleOrderItems,
+        en chunks de order_items_chunk_size IDs pedidos en paralelo: una página
+        de 100 órdenes cuesta un request extra en lugar de 100.
+        
+        Un chunk que falla no hace fallar la página: sus órdenes quedan sin
+        items y el error se registra en fetch_errors, así el cursor no avanza
+        y se vuelven a pedir en el próximo sync.
+        """
+        order_ids = [str(order.get('OrderId')) for order in orders if order.get('OrderId') is not None]
+        if not order_ids:
             return orders
-            
-        except requests.exceptions.HTTPError as e:
-            self.logger.error(f"HTTP Error from Falabella: {e}")
-            self.logger.error(f"Response content: {e.response.text if hasattr(e, 'response') else 'No response'}")
-            return []
+        
+        size = self.order_items_chunk_size
+        chunks = [order_ids[i:i + size] for i in range(0, len(order_ids), size)]
+        items_by_order = {}
+        with ThreadPoolExecutor(
+            max_workers=min(max(1, self.max_workers), len(chunks)),
+            thread_name_prefix='falabella-items'
+        ) as executor:
+            futures = {executor.submit(self._fetch_order_items_chunk, chunk): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    items_by_order.update(future.result())
+                except Exception as e:
+                    self.logger.error(f"Error fetching Falabella items for {len(chunk)} orders: {e}")
+                    self.item_errors.append({'order_ids': chunk, 'error': str(e)})
+                    self.fetch_errors.append(f"items {chunk[0]}..{chunk[-1]}: {e}")
+        
+        for order in orders:
+            items = items_by_order.get(str(order.get('OrderId')))
+            if items is not None:
+                order['OrderItems'] = items
+        return orders
+    
+    def _fetch_enriched_page(
+        self,
+        offset: int,
+        limit: int,
+        only_pending: bool,
+        created_after: Optional[str],
+        updated_after: Optional[str] = None,
+        created_before: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[int]]:
+        """Página de órdenes con sus items, pedidos desde el mismo worker"""
+        orders, total_count = self._fetch_orders_page(
+            offset, limit, only_pending, created_after, updated_after, created_before
+        )
+        if self.fetch_order_items and orders:
+            self._attach_order_items(orders)
+        return orders, total_count
+    
+    def _safe_fetch_orders_page(
+        self,
+        offset: int,
+        limit: int,
+        only_pending: bool,
+        created_after: Optional[str],
+        updated_after: Optional[str] = None,
+        created_before: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[int]]:
+        """Igual que _fetch_enriched_page pero registra el error y devuelve una página vacía"""
+        try:
+            return self._fetch_enriched_page(
+                offset, limit, only_pending, created_after, updated_after, created_before
+            )
         except Exception as e:
-            self.logger.error(f"Error fetching Falabella orders: {e}")
-            return []
+            self.logger.error(f"Error fetching Falabella orders (offset={offset}): {e}")
+            self.fetch_errors.append(f"offset {offset}: {e}")
+        return [], None
+    
+    def iter_order_pages(
+        self,
+        created_after: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+        only_pending: bool = True,
+        max_workers: int = 4,
+        updated_after: Optional[str] = None,
+        created_before: Optional[str] = None
+    ) -> Iterator[List[Dict]]:
+        """
+        Entrega páginas de órdenes de Falabella a medida que llegan.
+        
+        La primera página informa el total (Head.TotalCount) y el resto de los
+        offsets se piden en paralelo con a lo más max_workers requests en vuelo.
+        Si la API no informa el total, se piden tandas especulativas de
+        max_workers páginas hasta recibir una página incompleta. Una página que
+        falla (ya reintentada por _get) no cuenta como incompleta: queda en
+        fetch_errors y se sigue; si falla la tanda entera se lanza el error,
+        porque ya no se sabe dónde terminan las órdenes.
+        """
+        self.fetch_errors = []
+        self.item_errors = []
+        # Si falla la primera página el error se propaga: no es lo mismo que "sin órdenes"
+        first_page, total_count = self._fetch_enriched_page(
+            offset, limit, only_pending, created_after, updated_after, created_before
+        )
+        yield first_page
+        
+        if len(first_page) < limit:
+            return
+        
+        max_workers = max(1, max_workers)
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='falabella-pages') as executor:
+            def submit(page_offset: int):
+                return executor.submit(
+                    self._safe_fetch_orders_page,
+                    page_offset, limit, only_pending, created_after, updated_after, created_before
+                )
+            
+            if total_count is not None:
+                # Ventana deslizante: cada página que llega libera un cupo para la
+                # siguiente, así nunca hay más de max_workers páginas sin consumir
+                offsets = iter(range(offset + limit, total_count, limit))
+                in_flight = {submit(page_offset) for page_offset in islice(offsets, max_workers)}
+                while in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        next_offset = next(offsets, None)
+                        if next_offset is not None:
+                            in_flight.add(submit(next_offset))
+                        page, _ = future.result()
+                        yield page
+                return
+            
+            next_offset = offset + limit
+            while True:
+                wave = [next_offset + i * limit for i in range(max_workers)]
+                next_offset = wave[-1] + limit
+                futures = {
+                    executor.submit(
+                        self._fetch_enriched_page,
+                        page_offset, limit, only_pending, created_after, updated_after, created_before
+                    ): page_offset
+                    for page_offset in wave
+                }
+                exhausted = False
+                failed = []
+                for future in as_completed(futures):
+                    try:
+                        page, _ = future.result()
+                    except Exception as e:
+                        self.logger.error(f"Error fetching Falabella orders (offset={futures[future]}): {e}")
+                        self.fetch_errors.append(f"offset {futures[future]}: {e}")
+                        failed.append(futures[future])
+                        continue
+                    if len(page) < limit:
+                        exhausted = True
+                    if page:
+                        yield page
+                if exhausted:
+                    return
+                if len(failed) == len(wave):
+                    raise PlatformAPIError(
+                        f"falabella pages at offsets {wave[0]}-{wave[-1]} failed, stopping before the end of the orders"
+                    )
+    
+    def fetch_orders(
+        self, 
+        created_after: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+        only_pending: bool = True,
+        max_workers: int = 4,
+        updated_after: Optional[str] = None,
+        created_before: Optional[str] = None
+    ) -> List[Dict]:
+        """Obtiene todas las órdenes de Falabella recorriendo todas las páginas"""
+        orders = []
+        for page in self.iter_order_pages(
+            created_after=created_after,
+            limit=limit,
+            offset=offset,
+            only_pending=only_pending,
+            max_workers=max_workers,
+            updated_after=updated_after,
+            created_before=created_before
+        ):
+            self._page_fetched(len(page))
+            orders.extend(page)
+        
+        self.logger.info(f"Fetched {len(orders)} orders from Falabella")
+        return orders
+    
+    def sync_window(self, updated_after: Optional[datetime], initial_window_days: int) -> Dict:
+        """UpdatedAfter desde el cursor, o CreatedAfter de la ventana inicial"""
+        window = {'limit': self.page_size, 'max_workers': self.max_workers}
+        if updated_after:
+            window['updated_after'] = updated_after.isoformat()
+        else:
+            window['created_after'] = (datetime.now() - timedelta(days=initial_window_days)).isoformat()
+        return window
+    
+    def backfill_window(self, start: datetime, end: datetime) -> Dict:
+        """CreatedAfter/CreatedBefore de una ventana del backfill"""
+        return {
+            'limit': self.page_size,
+            'max_workers': self.max_workers,
+            'created_after': start.isoformat(),
+            'created_before': end.isoformat()
+        }
+    
+    def fetch_report(self) -> Dict:
+        return {'item_errors': self.item_errors}
+    
+    def _map_items(self, raw_items: List[Dict]) -> List[Dict]:
+        """Agrupa los OrderItem (uno por unidad) por SKU"""
+        items: Dict[str, Dict] = {}
+        for raw_item in raw_items:
+            sku = raw_item.get('Sku') or raw_item.get('ShopSku') or str(raw_item.get('OrderItemId'))
+            item = items.get(sku)
+            if item is None:
+                price = raw_item.get('PaidPrice') or raw_item.get('ItemPrice')
+                item = items[sku] = {
+                    'sku': sku,
+                    'name': raw_item.get('Name'),
+                    'variation': raw_item.get('Variation'),
+                    'quantity': 0,
+                    'unit_price': float(price) if price else None
+                }
+            item['quantity'] += 1
+        return list(items.values())
     
     def map_to_standard_order(self, raw_order: Dict) -> Dict:
         """Mapea orden de Falabella al formato estándar"""
@@ -125,6 +413,11 @@ class FalabellaIntegration(BasePlatformIntegration):
         ]
         shipping_address = ', '.join(filter(None, address_parts))
         
+        # Items (si se pidieron con GetMultipleOrderItems)
+        raw_items = raw_order.get('OrderItems')
+        items = self._map_items(raw_items) if raw_items is not None else None
+        items_count = sum(item['quantity'] for item in items) if items else int(raw_order.get('ItemsCount', 1))
+        
         return {
             'platform': Platform.FALABELLA,
             'external_order_id': str(raw_order.get('OrderId')),
@@ -134,11 +427,13 @@ class FalabellaIntegration(BasePlatformIntegration):
             'customer_name': f"{raw_order.get('CustomerFirstName', '')} {raw_order.get('CustomerLastName', '')}".strip(),
             'customer_phone': addr_ship.get('Phone'),
             'total_amount': float(raw_order.get('Price', 0)),
-            'items_count': int(raw_order.get('ItemsCount', 1)),
+            'items_count': items_count,
+            'items': items,
             'shipping_address': shipping_address,
             'shipping_city': addr_ship.get('City'),
             'limite_despacho': promised_shipping,
             'promised_delivery': promised_shipping,
             'created_at': created_at,
+            'source_updated_at': parse_iso_date(raw_order.get('UpdatedAt')),
             'raw_data': raw_order
         }
\ No newline at end of file
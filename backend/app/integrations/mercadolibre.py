@@ -1,14 +1,32 @@
-import requests
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-from .base import BasePlatformIntegration
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, Iterator, List, Dict, Optional
+from .base import BasePlatformIntegration, HttpTransport
+from .rate_limiter import get_rate_limiter
+from .shipment_cache import get_shipment_cache
 from app.models.enums import Platform, OrderStatus, ShippingType
 from app.utils.status_mapper import StatusMapper
 from app.utils.date_helpers import parse_iso_date
 
 class MercadoLibreIntegration(BasePlatformIntegration):
-    def __init__(self, access_token: str, user_id: str, base_url: str):
-        super().__init__(Platform.MERCADOLIBRE)
+    def __init__(
+        self,
+        access_token: str,
+        user_id: str,
+        base_url: str,
+        max_workers: int = 8,
+        transport: Optional[HttpTransport] = None,
+        rate_limit_per_second: float = 15.0,
+        rate_limit_burst: int = 20,
+        shipment_cache_ttl_seconds: float = 3600,
+        shipment_cache_max_entries: int = 20000,
+        shipment_cache_terminal_max_entries: int = 50000
+    ):
+        super().__init__(
+            Platform.MERCADOLIBRE,
+            transport,
+            get_rate_limiter(Platform.MERCADOLIBRE.value, user_id, rate_limit_per_second, rate_limit_burst)
+        )
         self.access_token = access_token
         self.user_id = user_id
         self.base_url = base_url
@@ -16,11 +34,172 @@ class MercadoLibreIntegration(BasePlatformIntegration):
             'Authorization': f'Bearer {access_token}',
             'x-format-new': 'true'
         }
+        self.max_workers = max(1, max_workers)
+        self.shipment_errors: List[Dict] = []
+        self.shipment_cache = get_shipment_cache(
+            user_id,
+            shipment_cache_ttl_seconds,
+            shipment_cache_max_entries,
+            shipment_cache_terminal_max_entries
+        )
+        self.shipments_fetched = 0
+        self.shipments_cached = 0
     
-    def fetch_orders(self, offset: int = 0, limit: int = 50, only_pending: bool = True) -> List[Dict]:
-        """Obtiene órdenes de MercadoLibre"""
-        try:
-            url = f"{self.base_url}/orders/search"
+    def _reset_run_state(self) -> None:
+        self.shipment_errors = []
+        self.fetch_errors = []
+        self.shipments_fetched = 0
+        self.shipments_cached = 0
+    
+    def _get_shipment(self, shipment_id: str) -> Dict:
+        """Obtiene detalles del shipment"""
+        url = f"{self.base_url}/shipments/{shipment_id}"
+        response = self._get(url, headers=self.headers, timeout=15)
+        return response.json()
+    
+    def _get_order(self, order_id: str) -> Dict:
+        """Obtiene una orden por ID"""
+        url = f"{self.base_url}/orders/{order_id}"
+        response = self._get(url, headers=self.headers, timeout=15)
+        return response.json()
+    
+    def _fetch_many(self, fetch: Callable[[str], Dict], ids: Iterable[str], kind: str) -> Dict[str, Dict]:
+        """Pide varios recursos en paralelo; los que fallan quedan en fetch_errors"""
+        ids = list(ids)
+        if not ids:
+            return {}
+        
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(ids)), thread_name_prefix=f'meli-{kind}') as executor:
+            futures = {executor.submit(fetch, resource_id): resource_id for resource_id in ids}
+            for future in as_completed(futures):
+                resource_id = futures[future]
+                try:
+                    results[resource_id] = future.result()
+                except Exception as e:
+                    self.logger.warning(f"Error fetching ML {kind} {resource_id}: {e}")
+                    self.fetch_errors.append(f"{kind} {resource_id}: {e}")
+        return results
+    
+    def fetch_orders_by_id(self, order_ids: Iterable[str] = (), shipment_ids: Iterable[str] = ()) -> List[Dict]:
+        """
+        Órdenes puntuales enriquecidas con su shipment, por ID de orden o de
+        shipment (como llegan en las notificaciones orders_v2 y shipments).
+        
+        Los shipments pedidos por ID se reutilizan como shipment_data de su
+        orden, así no se piden dos veces.
+        """
+        self._reset_run_state()
+        
+        shipments = self._fetch_many(self._get_shipment, set(shipment_ids), 'shipment')
+        self.shipments_fetched += len(shipments)
+        shipments_by_order = {
+            str(shipment['order_id']): shipment
+            for shipment in shipments.values()
+            if shipment.get('order_id')
+        }
+        
+        ids = set(str(order_id) for order_id in order_ids) | set(shipments_by_order)
+        orders = list(self._fetch_many(self._get_order, ids, 'order').values())
+        
+        missing = []
+        for order in orders:
+            shipment = shipments_by_order.get(str(order.get('id')))
+            if shipment is not None:
+                order['shipment_data'] = shipment
+                self.shipment_cache.put(
+                    shipment['id'], shipment, parse_iso_date(order.get('date_last_updated'))
+                )
+            else:
+                missing.append(order)
+        # Las órdenes cuyo shipment falla quedan fuera (ver _enrich_with_shipments)
+        orders = [order for order in orders if 'shipment_data' in order] + self._enrich_with_shipments(missing)
+        
+        self._page_fetched(len(orders))
+        return orders
+    
+    def _enrich_with_shipments(self, orders: List[Dict]) -> List[Dict]:
+        """
+        Agrega shipment_data a cada orden pidiendo los shipments en paralelo
+        sobre las conexiones del transport compartido.
+        
+        Solo se piden los shipments que pueden haber cambiado: si la orden no
+        cambió desde que se cacheó su shipment (o el shipment ya terminó) se
+        usa el del cache.
+        
+        Un shipment que falla no hace fallar el lote, pero sus órdenes se
+        excluyen del resultado: sin shipment el mapeo caería en el tipo de
+        envío, estado y límite por defecto y pisaría los guardados. El error
+        queda en fetch_errors, así el cursor no avanza y la próxima
+        sincronización las vuelve a pedir.
+        """
+        pending = {}
+        order_updated = {}
+        for order in orders:
+            shipment_id = order.get('shipping', {}).get('id')
+            if not shipment_id:
+                continue
+            updated = parse_iso_date(order.get('date_last_updated'))
+            if shipment_id not in pending:
+                cached = self.shipment_cache.get(shipment_id, updated)
+                if cached is not None:
+                    order['shipment_data'] = cached
+                    self.shipments_cached += 1
+                    continue
+            pending.setdefault(shipment_id, []).append(order)
+            if updated and (order_updated.get(shipment_id) is None or updated > order_updated[shipment_id]):
+                order_updated[shipment_id] = updated
+        
+        if not pending:
+            return orders
+        
+        failed = set()
+        workers = min(self.max_workers, len(pending))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='meli-shipments') as executor:
+            futures = {
+                executor.submit(self._get_shipment, shipment_id): shipment_id
+                for shipment_id in pending
+            }
+            for future in as_completed(futures):
+                shipment_id = futures[future]
+                try:
+                    shipment_data = future.result()
+                except Exception as e:
+                    self.logger.warning(f"Error fetching ML shipment {shipment_id}: {e}")
+                    self.shipment_errors.append({'shipment_id': str(shipment_id), 'error': str(e)})
+                    self.fetch_errors.append(f"shipment {shipment_id}: {e}")
+                    failed.add(shipment_id)
+                    continue
+                self.shipments_fetched += 1
+                self.shipment_cache.put(shipment_id, shipment_data, order_updated.get(shipment_id))
+                for order in pending[shipment_id]:
+                    order['shipment_data'] = shipment_data
+        
+        if failed:
+            return [order for order in orders if order.get('shipping', {}).get('id') not in failed]
+        return orders
+    
+    def iter_order_pages(
+        self,
+        offset: int = 0,
+        limit: int = 50,
+        only_pending: bool = True,
+        updated_after: Optional[str] = None,
+        max_pages: Optional[int] = None,
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None
+    ) -> Iterator[List[Dict]]:
+        """
+        Entrega páginas de órdenes de MercadoLibre ya enriquecidas con shipments.
+        
+        Recorre orders/search según paging.total hasta agotar los resultados o
+        llegar a max_pages páginas.
+        """
+        self._reset_run_state()
+        url = f"{self.base_url}/orders/search"
+        pages = 0
+        
+        while max_pages is None or pages < max_pages:
             params = {
                 'seller': self.user_id,
                 'offset': offset,
@@ -32,42 +211,93 @@ class MercadoLibreIntegration(BasePlatformIntegration):
             if only_pending:
                 params['shipping.status'] = 'ready_to_ship'
             
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
+            if updated_after:
+                params['order.date_last_updated.from'] = updated_after
             
-            orders = data.get('results', [])
+            if created_from:
+                params['order.date_created.from'] = created_from
             
-            # Enriquecer con shipments
-            enriched_orders = []
-            for order in orders:
-                shipment_id = order.get('shipping', {}).get('id')
-                if shipment_id:
-                    shipment_data = self._get_shipment(shipment_id)
-                    order['shipment_data'] = shipment_data
-                enriched_orders.append(order)
+            if created_to:
+                params['order.date_created.to'] = created_to
             
-            self.logger.info(f"Fetched {len(enriched_orders)} orders from MercadoLibre")
-            return enriched_orders
+            try:
+                response = self._get(url, headers=self.headers, params=params, timeout=30)
+                data = response.json()
+            except Exception as e:
+                # Si falla la primera página el error se propaga: no es lo mismo que "sin órdenes"
+                if pages == 0:
+                    raise
+                self.logger.error(f"Error fetching ML orders (offset={offset}): {e}")
+                self.fetch_errors.append(f"offset {offset}: {e}")
+                return
+            
+            orders = data.get('results', [])
+            pages += 1
             
-        except Exception as e:
-            self.logger.error(f"Error fetching ML orders: {e}")
-            return []
+            if orders:
+                # Enriquecer con shipments
+                yield self._enrich_with_shipments(orders)
+            
+            total = data.get('paging', {}).get('total', 0)
+            offset += limit
+            if len(orders) < limit or offset >= total:
+                return
+    
+    def fetch_orders(
+        self,
+        offset: int = 0,
+        limit: int = 50,
+        only_pending: bool = True,
+        updated_after: Optional[str] = None,
+        max_pages: Optional[int] = None,
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None
+    ) -> List[Dict]:
+        """Obtiene órdenes de MercadoLibre"""
+        enriched_orders = []
+        for page in self.iter_order_pages(
+            offset=offset,
+            limit=limit,
+            only_pending=only_pending,
+            updated_after=updated_after,
+            max_pages=max_pages,
+            created_from=created_from,
+            created_to=created_to
+        ):
+            self._page_fetched(len(page))
+            enriched_orders.extend(page)
         
-        def _get_shipment(self, shipment_id: str) -> Optional[Dict]:
-            """Obtiene detalles del shipment"""
-            try:
-                url = f"{self.base_url}/shipments/{shipment_id}"
-                response = requests.get(url, headers=self.headers, timeout=15)
-                response.raise_for_status()
-                return response.json()
-            except:
-                return None
+        if self.shipment_errors:
+            self.logger.warning(f"{len(self.shipment_errors)} ML shipments could not be fetched")
         
+        self.logger.info(f"Fetched {len(enriched_orders)} orders from MercadoLibre")
+        return enriched_orders
+    
+    def sync_window(self, updated_after: Optional[datetime], initial_window_days: int) -> Dict:
+        """order.date_last_updated.from desde el cursor o desde la ventana inicial"""
+        since = updated_after or (datetime.now(timezone.utc) - timedelta(days=initial_window_days))
+        return {'limit': 50, 'updated_after': since.isoformat(timespec='milliseconds')}
+    
+    def backfill_window(self, start: datetime, end: datetime) -> Dict:
+        """order.date_created.from/to de una ventana del backfill"""
+        return {
+            'limit': 50,
+            'created_from': start.isoformat(timespec='milliseconds'),
+            'created_to': end.isoformat(timespec='milliseconds')
+        }
+    
+    def fetch_report(self) -> Dict:
+        return {
+            'shipment_errors': self.shipment_errors,
+            'shipments_fetched': self.shipments_fetched,
+            'shipments_cached': self.shipments_cached,
+            'shipment_cache': self.shipment_cache.snapshot()
+        }
+    
     def map_to_standard_order(self, raw_order: Dict) -> Dict:
         """Mapea orden de MercadoLibre al formato estándar"""
         
-        shipment_data = raw_order.get('shipment_data', {})
+        shipment_data = raw_order.get('shipment_data') or {}
         logistic = shipment_data.get('logistic', {})
         
         # Tipo de envío
@@ -133,5 +363,6 @@ class MercadoLibreIntegration(BasePlatformIntegration):
             'limite_despacho': limite_despacho,
             'promised_delivery': parse_iso_date(lead_time.get('estimated_delivery_time', {}).get('date')),
             'created_at': date_created,
+            'source_updated_at': parse_iso_date(raw_order.get('date_last_updated')),
             'raw_data': {'order': raw_order, 'shipment': shipment_data}
         }
\ No newline at end of file
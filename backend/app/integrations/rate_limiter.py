@@ -0,0 +1,120 @@
+from typing import Dict, Optional, Tuple
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class RateLimiter:
+    """
+    Token bucket por plataforma y credencial.
+    
+    La tasa es adaptativa: cada 429 la reduce a la mitad (hasta min_rate) y
+    bloquea el bucket hasta que venza el Retry-After; cada request exitoso la
+    recupera de a poco hasta la tasa configurada.
+    """
+    
+    def __init__(self, name: str, rate: float, burst: int, min_rate: Optional[float] = None):
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or max(rate * 0.1, 0.1)
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.throttled_until = 0.0
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+        
+        self.requests = 0
+        self.throttle_events = 0
+        self.retries = 0
+        self.wait_seconds = 0.0
+    
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.last_refill
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self.last_refill = now
+    
+    def acquire(self) -> float:
+        """Espera hasta tener un token disponible; retorna los segundos esperados"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.throttled_until:
+                    delay = self.throttled_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    self.requests += 1
+                    self.wait_seconds += waited
+                    return waited
+                else:
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+    
+    def on_success(self) -> None:
+        """Recupera la tasa de forma aditiva después de un request exitoso"""
+        with self.lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+    
+    def on_throttled(self, retry_after: float) -> None:
+        """Registra un 429: reduce la tasa y pausa el bucket retry_after segundos"""
+        with self.lock:
+            self.throttle_events += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0
+            self.throttled_until = max(self.throttled_until, time.monotonic() + retry_after)
+        logger.warning(
+            f"Rate limited by {self.name}: pausing {retry_after:.1f}s, rate now {self.rate:.2f}/s"
+        )
+    
+    def on_retry(self) -> None:
+        with self.lock:
+            self.retries += 1
+    
+    def snapshot(self) -> Dict:
+        """Estado actual del limitador, para incluir en el resultado del sync"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                'rate_per_second': round(self.rate, 3),
+                'max_rate_per_second': self.max_rate,
+                'tokens_available': round(self.tokens, 2),
+                'throttled': now < self.throttled_until,
+                'throttled_for_seconds': round(max(0.0, self.throttled_until - now), 2),
+                'requests': self.requests,
+                'throttle_events': self.throttle_events,
+                'retries': self.retries,
+                'wait_seconds': round(self.wait_seconds, 2)
+            }
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Interpreta un header Retry-After (segundos o fecha HTTP)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(platform: str, credential: str, rate: float, burst: int) -> RateLimiter:
+    """Limitador compartido del proceso para una plataforma y credencial"""
+    key = (platform, credential)
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(f"{platform}:{credential}", rate, burst)
+        return _limiters[key]
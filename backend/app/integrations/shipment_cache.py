@@ -0,0 +1,109 @@
+from typing import Dict, Optional, Tuple
+from collections import OrderedDict
+from datetime import datetime
+import threading
+import time
+
+# Estados de shipment que ya no cambian: se guardan sin TTL y no se vuelven a pedir
+SHIPMENT_TERMINAL_STATUSES = {'delivered', 'cancelled'}
+
+class ShipmentCache:
+    """
+    Cache LRU de shipments de MercadoLibre por shipment ID.
+    
+    Cada entrada guarda el payload (con su last_updated) y el date_last_updated
+    de la orden cuando se pidió. Un shipment se reutiliza mientras la orden
+    no haya cambiado desde entonces y la entrada tenga menos de ttl_seconds;
+    el TTL cubre cambios del shipment que no tocan la orden.
+    
+    Los shipments en estado terminal van a un LRU aparte, sin TTL, para que
+    los activos no los desalojen.
+    """
+    
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 20000, terminal_max_entries: int = 50000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.terminal_max_entries = terminal_max_entries
+        # shipment_id -> (payload, order_updated, fetched_at)
+        self.active: "OrderedDict[str, Tuple[Dict, Optional[datetime], float]]" = OrderedDict()
+        self.terminal: "OrderedDict[str, Dict]" = OrderedDict()
+        self.lock = threading.Lock()
+        
+        self.hits = 0
+        self.terminal_hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+    
+    def get(self, shipment_id: str, order_updated: Optional[datetime] = None) -> Optional[Dict]:
+        """Shipment cacheado si sigue vigente para una orden con ese date_last_updated"""
+        shipment_id = str(shipment_id)
+        with self.lock:
+            payload = self.terminal.get(shipment_id)
+            if payload is not None:
+                self.terminal.move_to_end(shipment_id)
+                self.terminal_hits += 1
+                return payload
+            
+            entry = self.active.get(shipment_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            payload, cached_order_updated, fetched_at = entry
+            expired = time.monotonic() - fetched_at > self.ttl_seconds
+            order_changed = (
+                order_updated is None
+                or cached_order_updated is None
+                or order_updated > cached_order_updated
+            )
+            if expired or order_changed:
+                del self.active[shipment_id]
+                self.stale += 1
+                return None
+            
+            self.active.move_to_end(shipment_id)
+            self.hits += 1
+            return payload
+    
+    def put(self, shipment_id: str, payload: Dict, order_updated: Optional[datetime] = None) -> None:
+        shipment_id = str(shipment_id)
+        with self.lock:
+            if payload.get('status') in SHIPMENT_TERMINAL_STATUSES:
+                self.active.pop(shipment_id, None)
+                self.terminal[shipment_id] = payload
+                self.terminal.move_to_end(shipment_id)
+                while len(self.terminal) > self.terminal_max_entries:
+                    self.terminal.popitem(last=False)
+                    self.evictions += 1
+                return
+            
+            self.active[shipment_id] = (payload, order_updated, time.monotonic())
+            self.active.move_to_end(shipment_id)
+            while len(self.active) > self.max_entries:
+                self.active.popitem(last=False)
+                self.evictions += 1
+    
+    def snapshot(self) -> Dict:
+        with self.lock:
+            lookups = self.hits + self.terminal_hits + self.misses + self.stale
+            return {
+                'active_entries': len(self.active),
+                'terminal_entries': len(self.terminal),
+                'hits': self.hits,
+                'terminal_hits': self.terminal_hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'hit_ratio': round((self.hits + self.terminal_hits) / lookups, 3) if lookups else 0.0
+            }
+
+_caches: Dict[str, ShipmentCache] = {}
+_caches_lock = threading.Lock()
+
+def get_shipment_cache(user_id: str, ttl_seconds: float, max_entries: int, terminal_max_entries: int) -> ShipmentCache:
+    """Cache compartido del proceso para una cuenta de MercadoLibre"""
+    with _caches_lock:
+        if user_id not in _caches:
+            _caches[user_id] = ShipmentCache(ttl_seconds, max_entries, terminal_max_entries)
+        return _caches[user_id]
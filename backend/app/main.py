@@ -1,9 +1,21 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from contextlib import asynccontextmanager
 import logging
 
 from app.config import get_settings
-from app.api.v1 import orders, comments, tickets, dashboard, sync
+from app.api.v1 import orders, comments, tickets, dashboard, sync, webhooks
+from app.integrations.base import get_http_transport, close_http_transport
+from app.core.database import close_async_db
+from app.core.compression import CompressionMiddleware
+from app.core.scheduler import start_scheduler, shutdown_scheduler
+from app.services.sync_job_service import shutdown_sync_job_runner
+from app.services.backfill_service import shutdown_backfill_runner
+from app.services.order_outbox import start_order_outbox, shutdown_order_outbox
+from app.services.deadline_index import start_deadline_index, shutdown_deadline_index
+from app.services.dashboard_counters import start_dashboard_counters, shutdown_dashboard_counters
+from app.services.meli_notification_service import start_meli_notification_queue, shutdown_meli_notification_queue
 
 logging.basicConfig(
     level=logging.INFO,
@@ -13,9 +25,31 @@ logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Un solo pool HTTP por proceso para todas las integraciones
+    get_http_transport()
+    start_order_outbox()
+    start_deadline_index()
+    start_dashboard_counters()
+    start_meli_notification_queue()
+    start_scheduler()
+    yield
+    shutdown_scheduler()
+    shutdown_meli_notification_queue()
+    shutdown_sync_job_runner()
+    shutdown_backfill_runner()
+    shutdown_order_outbox()
+    shutdown_dashboard_counters()
+    shutdown_deadline_index()
+    close_http_transport()
+    await close_async_db()
+
 app = FastAPI(
     title=settings.APP_NAME,
-    version=settings.APP_VERSION
+    version=settings.APP_VERSION,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS
@@ -27,12 +61,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# br/gzip negociado por Accept-Encoding
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.GZIP_COMPRESSION_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY
+)
+
 # Routers
 app.include_router(orders.router, prefix="/api/v1/orders", tags=["orders"])
 app.include_router(comments.router, prefix="/api/v1/comments", tags=["comments"])
 app.include_router(tickets.router, prefix="/api/v1/tickets", tags=["tickets"])
 app.include_router(dashboard.router, prefix="/api/v1/dashboard", tags=["dashboard"])
 app.include_router(sync.router, prefix="/api/v1/sync", tags=["sync"])
+app.include_router(webhooks.router, prefix="/api/v1/webhooks", tags=["webhooks"])
 
 @app.get("/")
 async def root():
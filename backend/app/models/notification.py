@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional, Union
+
+class MeliNotification(BaseModel):
+    """Notificación de MercadoLibre (orders_v2, shipments, ...)"""
+    id: Optional[str] = Field(None, alias='_id')
+    resource: str
+    user_id: Union[int, str]
+    topic: str
+    application_id: Optional[Union[int, str]] = None
+    attempts: int = 1
+    sent: Optional[datetime] = None
+    received: Optional[datetime] = None
@@ -1,9 +1,16 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 from .enums import Platform, ShippingType, OrderStatus
 
+class OrderItem(BaseModel):
+    sku: str
+    name: Optional[str] = None
+    variation: Optional[str] = None
+    quantity: int = 1
+    unit_price: Optional[float] = None
+
 class OrderBase(BaseModel):
     platform: Platform
     external_order_id: str
@@ -15,6 +22,7 @@ class OrderBase(BaseModel):
     customer_email: Optional[str] = None
     total_amount: Optional[float] = None
     items_count: int = 1
+    items: Optional[List[OrderItem]] = None
     shipping_address: Optional[str] = None
     shipping_city: Optional[str] = None
     shipping_region: Optional[str] = None
@@ -39,4 +47,8 @@ class Order(OrderBase):
     updated_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class OrderDetail(Order):
+    """Orden con raw_data: solo para el detalle, los listados no lo traen"""
+    raw_data: Optional[dict] = None
\ No newline at end of file
@@ -0,0 +1,26 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Dict, List, Optional
+from uuid import UUID, uuid4
+from .enums import SyncJobStatus
+
+class PlatformSyncProgress(BaseModel):
+    status: str = "pending"
+    pages_fetched: int = 0
+    orders_fetched: int = 0
+    orders_upserted: int = 0
+    orders_queued: int = 0
+    errors: List[str] = Field(default_factory=list)
+
+class SyncJob(BaseModel):
+    id: UUID = Field(default_factory=uuid4)
+    kind: str
+    trigger: str = "api"
+    status: SyncJobStatus = SyncJobStatus.QUEUED
+    params: dict = Field(default_factory=dict)
+    progress: Dict[str, PlatformSyncProgress] = Field(default_factory=dict)
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,401 @@
+# =====================================================
+# backend/app/services/backfill_service.py
+# =====================================================
+# Tablas requeridas en Supabase:
+#
+#   create table sync_backfills (
+#       id uuid primary key,
+#       platforms text[] not null,
+#       start_at timestamptz not null,
+#       end_at timestamptz not null,
+#       window_hours int not null,
+#       status text not null,
+#       created_at timestamptz not null default now(),
+#       finished_at timestamptz
+#   );
+#
+#   create table sync_backfill_windows (
+#       backfill_id uuid not null references sync_backfills(id) on delete cascade,
+#       platform text not null,
+#       window_start timestamptz not null,
+#       window_end timestamptz not null,
+#       status text not null,
+#       orders_fetched int not null default 0,
+#       orders_synced int not null default 0,
+#       orders_failed int not null default 0,
+#       error text,
+#       completed_at timestamptz not null default now(),
+#       primary key (backfill_id, platform, window_start)
+#   );
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from uuid import UUID, uuid4
+from supabase import Client
+from app.core.database import get_db
+from app.config import get_settings
+from app.models.enums import Platform
+from app.services.sync_service import SyncService
+from app.utils.date_helpers import parse_iso_date
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+def split_windows(start: datetime, end: datetime, window_hours: int) -> List[Tuple[datetime, datetime]]:
+    """Parte [start, end) en ventanas consecutivas de window_hours horas"""
+    step = timedelta(hours=max(1, window_hours))
+    windows = []
+    window_start = start
+    while window_start < end:
+        window_end = min(window_start + step, end)
+        windows.append((window_start, window_end))
+        window_start = window_end
+    return windows
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+class BackfillService:
+    """Backfills históricos y el checkpoint de cada ventana terminada"""
+    
+    def __init__(self, db: Client):
+        self.db = db
+    
+    def create_backfill(
+        self,
+        platforms: List[Platform],
+        start: datetime,
+        end: datetime,
+        window_hours: int
+    ) -> Optional[Dict]:
+        """Registra un backfill nuevo"""
+        try:
+            data = {
+                'id': str(uuid4()),
+                'platforms': [platform.value for platform in platforms],
+                'start_at': _as_utc(start).isoformat(),
+                'end_at': _as_utc(end).isoformat(),
+                'window_hours': window_hours,
+                'status': 'queued'
+            }
+            result = self.db.table('sync_backfills').insert(data).execute()
+            return result.data[0] if result.data else data
+        except Exception as e:
+            logger.error(f"Error creating backfill: {e}")
+            return None
+    
+    def get_backfill(self, backfill_id: UUID) -> Optional[Dict]:
+        try:
+            result = self.db.table('sync_backfills').select('*').eq('id', str(backfill_id)).execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.error(f"Error fetching backfill {backfill_id}: {e}")
+            return None
+    
+    def get_backfills(self, limit: int = 20) -> List[Dict]:
+        try:
+            result = self.db.table('sync_backfills').select('*').order(
+                'created_at', desc=True
+            ).limit(limit).execute()
+            return result.data or []
+        except Exception as e:
+            logger.error(f"Error: {e}")
+            return []
+    
+    def set_status(self, backfill_id: UUID, status: str) -> bool:
+        try:
+            data = {'status': status}
+            if status in ('completed', 'incomplete', 'failed'):
+                data['finished_at'] = datetime.now(timezone.utc).isoformat()
+            self.db.table('sync_backfills').update(data).eq('id', str(backfill_id)).execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error updating backfill {backfill_id}: {e}")
+            return False
+    
+    def get_windows(self, backfill_id: UUID) -> List[Dict]:
+        try:
+            result = self.db.table('sync_backfill_windows').select('*').eq(
+                'backfill_id', str(backfill_id)
+            ).order('window_start').execute()
+            return result.data or []
+        except Exception as e:
+            logger.error(f"Error fetching backfill windows for {backfill_id}: {e}")
+            return []
+    
+    def get_completed_windows(self, backfill_id: UUID) -> Set[Tuple[str, datetime]]:
+        """(platform, window_start) de las ventanas ya terminadas"""
+        return {
+            (window['platform'], parse_iso_date(window['window_start']))
+            for window in self.get_windows(backfill_id)
+            if window['status'] == 'completed'
+        }
+    
+    def save_window(
+        self,
+        backfill_id: UUID,
+        platform: Platform,
+        window: Tuple[datetime, datetime],
+        status: str,
+        result: Dict
+    ) -> bool:
+        """Checkpoint de una ventana; una ventana completed no se vuelve a pedir"""
+        try:
+            self.db.table('sync_backfill_windows').upsert(
+                {
+                    'backfill_id': str(backfill_id),
+                    'platform': platform.value,
+                    'window_start': window[0].isoformat(),
+                    'window_end': window[1].isoformat(),
+                    'status': status,
+                    'orders_fetched': result.get('orders_fetched', 0),
+                    'orders_synced': result.get('orders_synced', 0),
+                    'orders_failed': result.get('orders_failed', 0),
+                    'error': result.get('error'),
+                    'completed_at': datetime.now(timezone.utc).isoformat()
+                },
+                on_conflict='backfill_id,platform,window_start'
+            ).execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving backfill window {platform.value} {window[0].isoformat()}: {e}")
+            return False
+
+class BackfillRunner:
+    """
+    Ejecuta backfills partiendo el rango en ventanas de window_hours.
+    
+    Cada plataforma procesa window_workers ventanas a la vez, cada una con su
+    propio SyncService; los limitadores de tasa y el pool HTTP son compartidos
+    por proceso, así que el paralelismo queda dentro de los límites de cada
+    API. Cada ventana terminada se guarda como checkpoint: al reanudar un
+    backfill solo se piden las ventanas que faltan o que fallaron.
+    """
+    
+    def __init__(self, db_factory: Callable[[], Client] = get_db, window_workers: int = 2):
+        self.db_factory = db_factory
+        self.window_workers = max(1, window_workers)
+        self.live: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+    
+    def _new_progress(self, backfill: Dict, windows: List[Tuple[datetime, datetime]], done: Set) -> Dict:
+        platforms = {}
+        for platform in backfill['platforms']:
+            already_done = sum(1 for window in windows if (platform, window[0]) in done)
+            platforms[platform] = {
+                'windows_total': len(windows),
+                'windows_done': already_done,
+                'windows_failed': 0,
+                'windows_resumed': already_done,
+                'orders_fetched': 0,
+                'orders_synced': 0,
+                'orders_failed': 0
+            }
+        return {
+            'id': str(backfill['id']),
+            'status': 'running',
+            'start_at': backfill['start_at'],
+            'end_at': backfill['end_at'],
+            'window_hours': backfill['window_hours'],
+            'started_at': datetime.now().isoformat(),
+            'started_monotonic': time.monotonic(),
+            'platforms': platforms
+        }
+    
+    def _record(self, progress: Dict, platform: str, orders_fetched: int = 0, **_) -> None:
+        """Callback de SyncService: órdenes descargadas página a página"""
+        if orders_fetched:
+            with self.lock:
+                progress['platforms'][platform]['orders_fetched'] += orders_fetched
+    
+    def _run_window(
+        self,
+        backfill_id: UUID,
+        platform: Platform,
+        window: Tuple[datetime, datetime],
+        progress: Dict
+    ) -> bool:
+        if self.stopping.is_set():
+            return False
+        
+        db = self.db_factory()
+        sync_service = SyncService(
+            db,
+            progress=lambda platform_value, **updates: self._record(progress, platform_value, **updates)
+        )
+        try:
+            result = sync_service.sync_range(platform, window[0], window[1])
+            # Una descarga incompleta o con escrituras fallidas (o todavía en el
+            # outbox) no se marca como terminada: se reintenta al reanudar. Las
+            # órdenes rechazadas al validar fallarían igual en cada reintento.
+            write_failures = result['orders_failed'] - result['orders_invalid']
+            complete = not result['fetch_errors'] and not write_failures and not result['orders_queued']
+            if not complete:
+                result['error'] = '; '.join(result['fetch_errors'][:5]) or (
+                    f"{write_failures} orders failed to save, {result['orders_queued']} still in outbox"
+                )
+        except Exception as e:
+            logger.error(f"Backfill window {platform.value} {window[0].isoformat()} failed: {e}")
+            result, complete = {'error': str(e)}, False
+        
+        status = 'completed' if complete else 'failed'
+        BackfillService(db).save_window(backfill_id, platform, window, status, result)
+        
+        with self.lock:
+            counters = progress['platforms'][platform.value]
+            counters['windows_done' if complete else 'windows_failed'] += 1
+            counters['orders_synced'] += result.get('orders_synced', 0)
+            counters['orders_failed'] += result.get('orders_failed', 0)
+        return complete
+    
+    def run(self, backfill_id: UUID) -> Optional[Dict]:
+        """
+        Ejecuta (o reanuda) un backfill en el thread actual, saltando las
+        ventanas que ya tienen checkpoint. Retorna el progreso final.
+        """
+        service = BackfillService(self.db_factory())
+        backfill = service.get_backfill(backfill_id)
+        if not backfill:
+            with self.lock:
+                self.live.pop(str(backfill_id), None)
+            return None
+        
+        windows = split_windows(
+            parse_iso_date(backfill['start_at']),
+            parse_iso_date(backfill['end_at']),
+            backfill['window_hours']
+        )
+        done = service.get_completed_windows(backfill_id)
+        progress = self._new_progress(backfill, windows, done)
+        with self.lock:
+            self.live[str(backfill_id)] = progress
+        service.set_status(backfill_id, 'running')
+        logger.info(f"Backfill {backfill_id}: {len(windows)} windows per platform, {len(done)} already done")
+        
+        executors = {
+            platform: ThreadPoolExecutor(
+                max_workers=self.window_workers,
+                thread_name_prefix=f"backfill-{platform}"
+            )
+            for platform in backfill['platforms']
+        }
+        try:
+            futures = [
+                executors[platform].submit(self._run_window, backfill_id, Platform(platform), window, progress)
+                for window in windows
+                for platform in backfill['platforms']
+                if (platform, window[0]) not in done
+            ]
+            all_complete = all([future.result() for future in as_completed(futures)])
+        except BaseException:
+            # Ctrl+C o error: no se empiezan más ventanas; las que corren terminan con checkpoint
+            self.stopping.set()
+            raise
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
+        
+        if self.stopping.is_set():
+            status = 'interrupted'
+        else:
+            status = 'completed' if all_complete else 'incomplete'
+        service.set_status(backfill_id, status)
+        with self.lock:
+            progress['status'] = status
+            progress['finished_at'] = datetime.now().isoformat()
+        logger.info(f"Backfill {backfill_id} finished with status {status}")
+        return self.get_progress(backfill_id)
+    
+    def start(
+        self,
+        platforms: List[Platform],
+        start: datetime,
+        end: datetime,
+        window_hours: int
+    ) -> Optional[Dict]:
+        """Crea un backfill y lo ejecuta en un thread propio"""
+        backfill = BackfillService(self.db_factory()).create_backfill(platforms, start, end, window_hours)
+        if not backfill:
+            return None
+        self.resume(backfill['id'])
+        return backfill
+    
+    def _run_in_thread(self, backfill_id: UUID) -> None:
+        """run() para resume(): si falla, el backfill no queda 'queued' o 'running' y se puede reanudar"""
+        try:
+            self.run(backfill_id)
+        except Exception as e:
+            logger.error(f"Backfill {backfill_id} failed: {e}")
+            with self.lock:
+                progress = self.live.get(str(backfill_id))
+                if progress and progress['status'] in ('queued', 'running'):
+                    progress['status'] = 'failed'
+    
+    def resume(self, backfill_id: UUID) -> bool:
+        """Reanuda un backfill en un thread propio; False si ya está encolado o corriendo"""
+        with self.lock:
+            current = self.live.get(str(backfill_id))
+            if current and current['status'] in ('queued', 'running'):
+                return False
+            self.live[str(backfill_id)] = {'id': str(backfill_id), 'status': 'queued'}
+        
+        thread = threading.Thread(
+            target=self._run_in_thread,
+            args=(backfill_id,),
+            name=f"backfill-{backfill_id}",
+            daemon=True
+        )
+        thread.start()
+        return True
+    
+    def get_progress(self, backfill_id: UUID) -> Optional[Dict]:
+        """Avance en vivo: ventanas, órdenes y órdenes por segundo por plataforma"""
+        with self.lock:
+            progress = self.live.get(str(backfill_id))
+            if progress is None:
+                return None
+            snapshot = {key: value for key, value in progress.items() if key not in ('platforms', 'started_monotonic')}
+            if 'started_monotonic' not in progress:
+                return snapshot
+            
+            elapsed = time.monotonic() - progress['started_monotonic']
+            snapshot['elapsed_seconds'] = round(elapsed, 1)
+            snapshot['platforms'] = {}
+            for platform, counters in progress['platforms'].items():
+                platform_progress = dict(counters)
+                processed = counters['windows_done'] - counters['windows_resumed'] + counters['windows_failed']
+                remaining = counters['windows_total'] - counters['windows_done'] - counters['windows_failed']
+                platform_progress['orders_per_second'] = round(counters['orders_fetched'] / elapsed, 1) if elapsed else 0.0
+                platform_progress['eta_seconds'] = (
+                    round(remaining * elapsed / processed) if processed and snapshot['status'] == 'running' else None
+                )
+                snapshot['platforms'][platform] = platform_progress
+            total_fetched = sum(counters['orders_fetched'] for counters in progress['platforms'].values())
+            snapshot['orders_per_second'] = round(total_fetched / elapsed, 1) if elapsed else 0.0
+            return snapshot
+    
+    def shutdown(self) -> None:
+        """Deja de empezar ventanas nuevas; las que corren terminan y quedan con checkpoint"""
+        self.stopping.set()
+
+_runner: Optional[BackfillRunner] = None
+_runner_lock = threading.Lock()
+
+def get_backfill_runner() -> BackfillRunner:
+    """Runner compartido del proceso"""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = BackfillRunner(window_workers=get_settings().BACKFILL_WINDOW_WORKERS)
+    return _runner
+
+def shutdown_backfill_runner() -> None:
+    global _runner
+    with _runner_lock:
+        if _runner is not None:
+            _runner.shutdown()
+            _runner = None
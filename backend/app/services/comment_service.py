@@ -1,22 +1,24 @@
 from typing import List, Optional
 from uuid import UUID
-from supabase import Client
+from supabase import AsyncClient
 from app.models.comment import Comment, CommentCreate
 import logging
 
 logger = logging.getLogger(__name__)
 
-class CommentService:
-    def __init__(self, db: Client):
+class AsyncCommentService:
+    """Comentarios de órdenes, con el cliente async de Supabase para los endpoints"""
+    
+    def __init__(self, db: AsyncClient):
         self.db = db
     
-    def create_comment(self, comment_data: CommentCreate) -> Optional[Comment]:
+    async def create_comment(self, comment_data: CommentCreate) -> Optional[Comment]:
         """Crea un comentario"""
         try:
             data = comment_data.model_dump()
             data['order_id'] = str(data['order_id'])
             
-            result = self.db.table('comments').insert(data).execute()
+            result = await self.db.table('comments').insert(data).execute()
             
             if result.data:
                 logger.info(f"Comment created for order {comment_data.order_id}")
@@ -26,10 +28,10 @@ class CommentService:
             logger.error(f"Error creating comment: {e}")
             return None
     
-    def get_comments_by_order(self, order_id: UUID) -> List[Comment]:
+    async def get_comments_by_order(self, order_id: UUID) -> List[Comment]:
         """Comentarios de una orden"""
         try:
-            result = self.db.table('comments').select('*').eq(
+            result = await self.db.table('comments').select('*').eq(
                 'order_id', str(order_id)
             ).order('created_at', desc=True).execute()
             
@@ -37,4 +39,3 @@ class CommentService:
         except Exception as e:
             logger.error(f"Error: {e}")
             return []
-
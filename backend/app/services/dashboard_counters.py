@@ -0,0 +1,365 @@
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from collections import Counter
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo
+from supabase import Client
+from app.core.database import get_db
+from app.config import get_settings
+from app.models.enums import OrderStatus
+from app.services.deadline_index import OPEN_ORDER_STATUSES, get_deadline_index
+from app.utils.date_helpers import parse_iso_date
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Filas por página al sembrar o reconciliar
+COUNTERS_LOAD_PAGE_SIZE = 1000
+
+STAT_FIELDS = (
+    'orders_today',
+    'orders_delayed',
+    'orders_ready_to_ship',
+    'orders_shipped',
+    'orders_delivered_today',
+    'avg_delay_hours'
+)
+
+OrderKey = Tuple[str, str]
+PartitionKey = Tuple[str, str]
+
+# Estado de una orden: (partición, grupo, timestamp límite, día, atrasada)
+# grupo es 'open', 'shipped' o 'delivered'; día es el del límite para las
+# abiertas y el de la entrega para las entregadas
+OrderState = Tuple[PartitionKey, str, float, Optional[date], bool]
+
+def _apply_state(counters: Dict[PartitionKey, Counter], state: Optional[OrderState], sign: int) -> None:
+    """Suma (sign=1) o resta (sign=-1) una orden de los contadores de su partición"""
+    if state is None:
+        return
+    partition, group, deadline_ts, day, delayed = state
+    counter = counters.setdefault(partition, Counter())
+    counter[group] += sign
+    if group == 'open':
+        counter[('due', day)] += sign
+        if delayed:
+            counter['delayed'] += sign
+            counter['delayed_deadline_sum'] += sign * deadline_ts
+    elif group == 'delivered':
+        counter[('delivered', day)] += sign
+
+class DashboardCounters:
+    """
+    Contadores del dashboard mantenidos en memoria, por plataforma y tipo de envío.
+    
+    Se siembran una vez desde la tabla orders y después se actualizan con
+    cada upsert de OrderService y con las transiciones a atrasada del índice
+    de plazos, así /dashboard/stats no agrega la tabla en cada llamada. Cada
+    reconcile_seconds se recalculan desde la base y se reporta la deriva.
+    
+    Definiciones (días en DASHBOARD_TIMEZONE):
+    - orders_today: abiertas con límite de despacho hoy
+    - orders_delayed: abiertas con el límite vencido
+    - orders_ready_to_ship: abiertas (listo_despachar, etiqueta_impresa)
+    - orders_shipped: enviadas
+    - orders_delivered_today: entregadas hoy
+    - avg_delay_hours: atraso promedio de las abiertas vencidas
+    """
+    
+    def __init__(
+        self,
+        db_factory: Callable[[], Client] = get_db,
+        reconcile_seconds: float = 600.0,
+        tz_name: str = 'America/Santiago'
+    ):
+        self.db_factory = db_factory
+        self.reconcile_seconds = reconcile_seconds
+        self.tz = ZoneInfo(tz_name)
+        
+        self.orders: Dict[OrderKey, OrderState] = {}
+        self.counters: Dict[PartitionKey, Counter] = {}
+        
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.loaded = False
+        # Mientras se recarga desde la base, las filas observadas y los atrasos
+        # detectados se guardan para reaplicarlos sobre lo recargado
+        self.replay: Optional[List[Dict]] = None
+        self.replay_delays: List[Tuple[OrderKey, datetime]] = []
+        
+        self.stats = {
+            'reconciliations': 0,
+            'reconcile_errors': 0,
+            'last_reconciled_at': None,
+            'last_drift': {}
+        }
+    
+    def _today(self) -> date:
+        return datetime.now(self.tz).date()
+    
+    def _local_day(self, moment: datetime) -> date:
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.astimezone(self.tz).date()
+    
+    def _apply(self, state: Optional[OrderState], sign: int) -> None:
+        _apply_state(self.counters, state, sign)
+    
+    def _set(self, key: OrderKey, state: Optional[OrderState]) -> None:
+        self._apply(self.orders.pop(key, None), -1)
+        if state is not None:
+            self.orders[key] = state
+            self._apply(state, 1)
+    
+    def _state_for(self, row: Dict, previous: Optional[OrderState], delivered_on: Optional[date]) -> Optional[OrderState]:
+        """Estado nuevo de una orden a partir de su fila; None si no cuenta en ningún contador"""
+        status = row.get('current_status')
+        partition = (row['platform'], row.get('shipping_type') or '')
+        deadline = row.get('limite_despacho')
+        if isinstance(deadline, str):
+            deadline = parse_iso_date(deadline)
+        if deadline is not None and deadline.tzinfo is None:
+            deadline = deadline.replace(tzinfo=timezone.utc)
+        deadline_ts = deadline.timestamp() if deadline else 0.0
+        
+        if status in OPEN_ORDER_STATUSES and deadline is not None:
+            return (partition, 'open', deadline_ts, self._local_day(deadline), deadline_ts <= time.time())
+        if status == OrderStatus.ENVIADO.value:
+            return (partition, 'shipped', deadline_ts, None, False)
+        if status == OrderStatus.ENTREGADO.value:
+            if previous is not None and previous[1] == 'delivered':
+                return previous
+            if delivered_on is not None:
+                return (partition, 'delivered', deadline_ts, delivered_on, False)
+        return None
+    
+    def _observe_locked(self, rows: Iterable[Dict]) -> None:
+        today = self._today()
+        for row in rows:
+            key = (row['platform'], row['external_order_id'])
+            previous = self.orders.get(key)
+            # Solo se cuenta como entregada hoy si la veníamos siguiendo abierta o enviada;
+            # una entregada que no conocíamos es una orden vieja que volvió en el sync
+            delivered_on = today if previous is not None and previous[1] != 'delivered' else None
+            self._set(key, self._state_for(row, previous, delivered_on))
+    
+    def observe(self, rows: Iterable[Dict]) -> None:
+        """Aplica órdenes recién guardadas (filas de prepare_order_rows)"""
+        rows = list(rows)
+        with self.lock:
+            if self.replay is not None:
+                self.replay.extend(rows)
+            self._observe_locked(rows)
+    
+    def on_deadline_event(self, event: str, key: OrderKey, deadline: datetime) -> None:
+        """Listener del índice de plazos: una orden abierta pasó su límite"""
+        if event != 'delayed':
+            return
+        with self.lock:
+            if self.replay is not None:
+                self.replay_delays.append((key, deadline))
+            self._mark_delayed_locked(key, deadline)
+    
+    def _mark_delayed_locked(self, key: OrderKey, deadline: datetime) -> None:
+        state = self.orders.get(key)
+        if state is None or state[1] != 'open' or state[4] or state[2] != deadline.timestamp():
+            return
+        self._set(key, state[:4] + (True,))
+    
+    def _load_rows(self, db: Client) -> List[Dict]:
+        """Órdenes abiertas y enviadas, más las entregadas hoy"""
+        columns = 'platform,external_order_id,shipping_type,current_status,limite_despacho,updated_at'
+        start_of_day = datetime.combine(self._today(), datetime.min.time(), self.tz)
+        queries = [
+            lambda: db.table('orders').select(columns).in_(
+                'current_status', list(OPEN_ORDER_STATUSES) + [OrderStatus.ENVIADO.value]
+            ),
+            lambda: db.table('orders').select(columns).eq(
+                'current_status', OrderStatus.ENTREGADO.value
+            ).gte('updated_at', start_of_day.isoformat())
+        ]
+        rows = []
+        for query in queries:
+            offset = 0
+            while True:
+                page = query().order('id').range(offset, offset + COUNTERS_LOAD_PAGE_SIZE - 1).execute().data or []
+                rows.extend(page)
+                if len(page) < COUNTERS_LOAD_PAGE_SIZE:
+                    break
+                offset += COUNTERS_LOAD_PAGE_SIZE
+        return rows
+    
+    def _build(self, rows: List[Dict]) -> Tuple[Dict[OrderKey, OrderState], Dict[PartitionKey, Counter]]:
+        """Estado y contadores a partir de las filas de la base, sin tocar los actuales"""
+        orders: Dict[OrderKey, OrderState] = {}
+        counters: Dict[PartitionKey, Counter] = {}
+        for row in rows:
+            key = (row['platform'], row['external_order_id'])
+            delivered_on = None
+            if row.get('current_status') == OrderStatus.ENTREGADO.value:
+                updated_at = parse_iso_date(row.get('updated_at'))
+                delivered_on = self._local_day(updated_at) if updated_at else self._today()
+            # Una orden puede repetirse si cambió de página durante la carga
+            _apply_state(counters, orders.pop(key, None), -1)
+            state = self._state_for(row, None, delivered_on)
+            if state is not None:
+                orders[key] = state
+                _apply_state(counters, state, 1)
+        return orders, counters
+    
+    def reconcile(self) -> bool:
+        """
+        Recalcula los contadores desde la base y reemplaza los actuales; False
+        si falló. La carga y el recálculo corren sin el lock, que solo se toma
+        para el reemplazo, así /dashboard/stats no espera el escaneo.
+        """
+        with self.lock:
+            self.replay = []
+            self.replay_delays = []
+        try:
+            orders, counters = self._build(self._load_rows(self.db_factory()))
+        except Exception as e:
+            logger.error(f"Error reconciling dashboard counters: {e}")
+            with self.lock:
+                self.replay = None
+                self.replay_delays = []
+                self.stats['reconcile_errors'] += 1
+            return False
+        
+        with self.lock:
+            before = self._totals() if self.loaded else None
+            replay, self.replay = self.replay, None
+            replay_delays, self.replay_delays = self.replay_delays, []
+            self.orders = orders
+            self.counters = counters
+            # Lo que se guardó o se atrasó durante la carga puede no estar en lo leído
+            self._observe_locked(replay)
+            for key, deadline in replay_delays:
+                self._mark_delayed_locked(key, deadline)
+            
+            if before is not None:
+                after = self._totals()
+                drift = {
+                    field: round(after[field] - before[field], 2)
+                    for field in STAT_FIELDS
+                    if after[field] != before[field]
+                }
+                self.stats['last_drift'] = drift
+                if drift:
+                    logger.warning(f"Dashboard counters drifted from the database: {drift}")
+            self.loaded = True
+            self.stats['reconciliations'] += 1
+            self.stats['last_reconciled_at'] = datetime.now().isoformat()
+        return True
+    
+    def _fields(self, counters: Iterable[Counter], today: date, now: float) -> Dict:
+        totals = Counter()
+        for counter in counters:
+            totals['orders_today'] += counter[('due', today)]
+            totals['orders_delayed'] += counter['delayed']
+            totals['orders_ready_to_ship'] += counter['open']
+            totals['orders_shipped'] += counter['shipped']
+            totals['orders_delivered_today'] += counter[('delivered', today)]
+            totals['delayed_deadline_sum'] += counter['delayed_deadline_sum']
+        delayed = totals['orders_delayed']
+        # Promedio de (ahora - límite) = ahora - promedio de los límites
+        avg_delay_hours = (now - totals['delayed_deadline_sum'] / delayed) / 3600 if delayed else 0
+        return {
+            'orders_today': totals['orders_today'],
+            'orders_delayed': delayed,
+            'orders_ready_to_ship': totals['orders_ready_to_ship'],
+            'orders_shipped': totals['orders_shipped'],
+            'orders_delivered_today': totals['orders_delivered_today'],
+            'avg_delay_hours': round(avg_delay_hours, 2)
+        }
+    
+    def _totals(self) -> Dict:
+        return self._fields(self.counters.values(), self._today(), time.time())
+    
+    def snapshot(self) -> Dict:
+        """Totales y desglose por plataforma y tipo de envío"""
+        today = self._today()
+        now = time.time()
+        with self.lock:
+            by_platform: Dict[str, List[Counter]] = {}
+            for (platform, _), counter in self.counters.items():
+                by_platform.setdefault(platform, []).append(counter)
+            return {
+                **self._fields(self.counters.values(), today, now),
+                'by_platform': {
+                    platform: self._fields(counters, today, now)
+                    for platform, counters in by_platform.items()
+                },
+                'by_shipping_type': {
+                    shipping_type: self._fields([counter], today, now)
+                    for (_, shipping_type), counter in self.counters.items()
+                },
+                'source': 'counters',
+                'last_reconciled_at': self.stats['last_reconciled_at'],
+                'last_drift': self.stats['last_drift']
+            }
+    
+    def _run(self) -> None:
+        while not self.loaded and not self.stop_event.is_set():
+            if not self.reconcile():
+                self.stop_event.wait(min(60.0, self.reconcile_seconds))
+        # La reconciliación también descarta las entregas de días anteriores
+        while not self.stop_event.wait(self.reconcile_seconds):
+            self.reconcile()
+    
+    def start(self) -> None:
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='dashboard-counters', daemon=True)
+        self.thread.start()
+    
+    def stop(self, timeout: float = 10.0) -> None:
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+_counters: Optional[DashboardCounters] = None
+_counters_lock = threading.Lock()
+
+def get_dashboard_counters() -> Optional[DashboardCounters]:
+    """Contadores compartidos del proceso, None si están deshabilitados"""
+    global _counters
+    settings = get_settings()
+    if not settings.DASHBOARD_COUNTERS_ENABLED:
+        return None
+    if _counters is None:
+        with _counters_lock:
+            if _counters is None:
+                _counters = DashboardCounters(
+                    reconcile_seconds=settings.DASHBOARD_RECONCILE_SECONDS,
+                    tz_name=settings.DASHBOARD_TIMEZONE
+                )
+    return _counters
+
+def record_orders(rows: Iterable[Dict]) -> None:
+    """Aplica las órdenes guardadas a los contadores, si están corriendo"""
+    if _counters is not None:
+        _counters.observe(rows)
+
+def start_dashboard_counters() -> Optional[DashboardCounters]:
+    counters = get_dashboard_counters()
+    if counters is not None:
+        index = get_deadline_index()
+        if index is not None:
+            index.add_listener(counters.on_deadline_event)
+        counters.start()
+    return counters
+
+def shutdown_dashboard_counters() -> None:
+    global _counters
+    with _counters_lock:
+        if _counters is not None:
+            index = get_deadline_index()
+            if index is not None:
+                index.remove_listener(_counters.on_deadline_event)
+            _counters.stop()
+            _counters = None
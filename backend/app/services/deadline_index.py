@@ -0,0 +1,515 @@
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from datetime import datetime, timedelta, timezone
+from supabase import Client
+from app.core.database import get_db
+from app.config import get_settings
+from app.models.enums import OrderStatus
+from app.services.order_cache import invalidate_order_lists
+from app.utils.date_helpers import parse_iso_date
+import bisect
+import heapq
+import itertools
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Solo las órdenes que todavía no salieron pueden atrasarse
+OPEN_ORDER_STATUSES = {OrderStatus.LISTO_DESPACHAR.value, OrderStatus.ETIQUETA_IMPRESA.value}
+
+# Filas por página al cargar las órdenes abiertas
+DEADLINE_LOAD_PAGE_SIZE = 1000
+
+# external_order_id por consulta al completar id y created_at de órdenes nuevas
+DEADLINE_RESOLVE_CHUNK_SIZE = 200
+
+# Backoff entre intentos de carga si Supabase falla al arrancar
+DEADLINE_LOAD_RETRY_SECONDS = 5.0
+DEADLINE_LOAD_RETRY_MAX_SECONDS = 300.0
+
+# Columnas que se guardan de cada orden abierta para responder /orders/at-risk
+SUMMARY_COLUMNS = (
+    'id', 'platform', 'external_order_id', 'order_number', 'shipping_type',
+    'current_status', 'customer_name', 'customer_phone', 'customer_email',
+    'total_amount', 'items_count', 'shipping_address', 'shipping_city',
+    'shipping_region', 'limite_despacho', 'promised_delivery', 'is_delayed',
+    'created_at'
+)
+
+OrderKey = Tuple[str, str]
+PartitionKey = Tuple[str, str]
+
+class DeadlineIndex:
+    """
+    Índice en memoria de los límites de despacho de las órdenes abiertas.
+    
+    Cada orden tiene dos eventos en un heap: entra en riesgo a
+    limite_despacho - risk_hours y se atrasa en limite_despacho. Un thread
+    duerme hasta el próximo evento, así las transiciones ocurren en el
+    momento exacto sin escanear la tabla; en el heap, registrar o actualizar
+    una orden cuesta O(log n).
+    
+    Los atrasos se escriben en Supabase (is_delayed, delay_detected_at) en
+    lotes cada flush_seconds, un update por plataforma y minuto de detección.
+    Los listeners reciben cada transición (event, key, limite_despacho).
+    
+    Además mantiene las órdenes abiertas en listas ordenadas por límite,
+    una por (platform, shipping_type), para responder consultas por rango
+    ("vencen en las próximas 2h, solo Flex") con bisect. La búsqueda es
+    O(log n) pero insertar o sacar de una lista es O(n) en su partición (un
+    memmove: ~5 µs con 10k órdenes, ~40 µs con 100k), así que una
+    actualización cuesta O(n) en total, igual sin consultar la base.
+    """
+    
+    def __init__(
+        self,
+        db_factory: Callable[[], Client] = get_db,
+        risk_hours: int = 6,
+        flush_seconds: float = 30.0
+    ):
+        self.db_factory = db_factory
+        self.risk_delta = timedelta(hours=risk_hours)
+        self.flush_seconds = flush_seconds
+        
+        # key -> (limite_despacho, versión); la versión invalida eventos viejos del heap
+        self.deadlines: Dict[OrderKey, Tuple[datetime, int]] = {}
+        self.heap: List[Tuple[float, int, str, OrderKey, int]] = []
+        self.at_risk: Set[OrderKey] = set()
+        self.delayed: Set[OrderKey] = set()
+        self.pending_writes: Dict[OrderKey, datetime] = {}
+        self.listeners: List[Callable[[str, OrderKey, datetime], None]] = []
+        
+        # (platform, shipping_type) -> [(timestamp límite, external_order_id)] ordenada
+        self.partitions: Dict[PartitionKey, List[Tuple[float, str]]] = {}
+        self.placements: Dict[OrderKey, Tuple[PartitionKey, float]] = {}
+        self.summaries: Dict[OrderKey, Dict] = {}
+        # Órdenes registradas desde un upsert, que no devuelve id ni created_at
+        self.unresolved: Set[OrderKey] = set()
+        
+        self.versions = itertools.count()
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.loaded = False
+        self.thread: Optional[threading.Thread] = None
+        
+        self.stats = {
+            'transitions_at_risk': 0,
+            'transitions_delayed': 0,
+            'delays_written': 0,
+            'write_errors': 0,
+            'last_flush_at': None
+        }
+    
+    def add_listener(self, listener: Callable[[str, OrderKey, datetime], None]) -> None:
+        self.listeners.append(listener)
+    
+    def remove_listener(self, listener: Callable[[str, OrderKey, datetime], None]) -> None:
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+    
+    def _notify(self, events: List[Tuple[str, OrderKey, datetime]]) -> None:
+        for listener in self.listeners:
+            for event in events:
+                try:
+                    listener(*event)
+                except Exception as e:
+                    logger.error(f"Deadline listener failed on {event[0]} {event[1]}: {e}")
+    
+    def _place(self, key: OrderKey, shipping_type: Optional[str], deadline: datetime) -> None:
+        """Ubica la orden en la partición de su tipo de envío, ordenada por límite; O(n) en la partición"""
+        partition = (key[0], shipping_type or '')
+        timestamp = deadline.timestamp()
+        if self.placements.get(key) == (partition, timestamp):
+            return
+        self._unplace(key)
+        bisect.insort(self.partitions.setdefault(partition, []), (timestamp, key[1]))
+        self.placements[key] = (partition, timestamp)
+    
+    def _unplace(self, key: OrderKey) -> None:
+        placement = self.placements.pop(key, None)
+        if placement is None:
+            return
+        partition, timestamp = placement
+        entries = self.partitions[partition]
+        position = bisect.bisect_left(entries, (timestamp, key[1]))
+        if position < len(entries) and entries[position] == (timestamp, key[1]):
+            del entries[position]
+        if not entries:
+            del self.partitions[partition]
+    
+    def _discard(self, key: OrderKey) -> None:
+        self._unplace(key)
+        self.summaries.pop(key, None)
+        self.unresolved.discard(key)
+        self.deadlines.pop(key, None)
+        self.at_risk.discard(key)
+        self.delayed.discard(key)
+        self.pending_writes.pop(key, None)
+    
+    def _push(self, key: OrderKey, deadline: datetime, already_delayed: bool) -> None:
+        version = next(self.versions)
+        self.deadlines[key] = (deadline, version)
+        self.at_risk.discard(key)
+        self.delayed.discard(key)
+        if already_delayed:
+            # Ya quedó marcada al guardarla: solo se refleja en memoria
+            self.delayed.add(key)
+            return
+        risk_at = (deadline - self.risk_delta).timestamp()
+        heapq.heappush(self.heap, (risk_at, next(self.sequence), 'at_risk', key, version))
+        heapq.heappush(self.heap, (deadline.timestamp(), next(self.sequence), 'delayed', key, version))
+    
+    def observe(self, rows: Iterable[Dict]) -> None:
+        """Registra órdenes recién guardadas (filas de prepare_order_rows o de la tabla)"""
+        with self.condition:
+            for row in rows:
+                key = (row['platform'], row['external_order_id'])
+                deadline = row.get('limite_despacho')
+                if isinstance(deadline, str):
+                    deadline = parse_iso_date(deadline)
+                if row.get('current_status') not in OPEN_ORDER_STATUSES or deadline is None:
+                    self._discard(key)
+                    continue
+                if deadline.tzinfo is None:
+                    deadline = deadline.replace(tzinfo=timezone.utc)
+                
+                # Las filas del upsert no traen id ni created_at: se conservan los
+                # cargados y, si la orden es nueva, el thread los consulta (resolve)
+                summary = self.summaries.get(key, {})
+                summary.update((column, row[column]) for column in SUMMARY_COLUMNS if column in row)
+                summary['limite_despacho'] = deadline.isoformat()
+                self.summaries[key] = summary
+                if summary.get('id') is None:
+                    self.unresolved.add(key)
+                self._place(key, row.get('shipping_type'), deadline)
+                
+                current = self.deadlines.get(key)
+                if current and current[0] == deadline:
+                    continue
+                self._push(key, deadline, bool(row.get('is_delayed')) and deadline <= datetime.now(timezone.utc))
+            
+            # Compacta el heap si se llenó de eventos invalidados
+            if len(self.heap) > 4 * len(self.deadlines) + 1000:
+                live = {key: version for key, (_, version) in self.deadlines.items()}
+                self.heap = [entry for entry in self.heap if live.get(entry[3]) == entry[4]]
+                heapq.heapify(self.heap)
+            self.condition.notify()
+    
+    def _pop_due(self, now: float) -> List[Tuple[str, OrderKey, datetime]]:
+        events = []
+        # Se detecta al dispararse: coincide con el límite salvo órdenes que ya
+        # venían vencidas al cargar el índice, que comparten el minuto de carga
+        detected_at = datetime.fromtimestamp(now, timezone.utc)
+        while self.heap and self.heap[0][0] <= now:
+            _, _, kind, key, version = heapq.heappop(self.heap)
+            current = self.deadlines.get(key)
+            if current is None or current[1] != version:
+                continue
+            deadline = current[0]
+            if kind == 'at_risk':
+                if deadline.timestamp() > now:
+                    self.at_risk.add(key)
+                    self.stats['transitions_at_risk'] += 1
+                    events.append(('at_risk', key, deadline))
+            else:
+                self.at_risk.discard(key)
+                self.delayed.add(key)
+                self.summaries[key]['is_delayed'] = True
+                self.pending_writes[key] = detected_at
+                self.stats['transitions_delayed'] += 1
+                events.append(('delayed', key, deadline))
+        return events
+    
+    def flush(self) -> int:
+        """Escribe los atrasos pendientes; un update por plataforma y minuto de detección"""
+        with self.condition:
+            pending = self.pending_writes
+            self.pending_writes = {}
+        if not pending:
+            return 0
+        
+        groups: Dict[Tuple[str, str], List[str]] = {}
+        for (platform, external_order_id), detected_at in pending.items():
+            minute = detected_at.replace(second=0, microsecond=0).isoformat()
+            groups.setdefault((platform, minute), []).append(external_order_id)
+        
+        db = self.db_factory()
+        written = 0
+        failed: Dict[OrderKey, datetime] = {}
+        for (platform, minute), external_ids in groups.items():
+            try:
+                db.table('orders').update({
+                    'is_delayed': True,
+                    'delay_detected_at': minute
+                }).eq('platform', platform).eq('is_delayed', False).in_(
+                    'external_order_id', external_ids
+                ).execute()
+                written += len(external_ids)
+            except Exception as e:
+                logger.error(f"Error marking {len(external_ids)} {platform} orders as delayed: {e}")
+                for external_order_id in external_ids:
+                    failed[(platform, external_order_id)] = pending[(platform, external_order_id)]
+        
+        with self.condition:
+            # Los que fallaron se reintentan en el próximo flush, salvo que la orden haya cambiado
+            for key, detected_at in failed.items():
+                if key in self.delayed:
+                    self.pending_writes.setdefault(key, detected_at)
+            self.stats['delays_written'] += written
+            self.stats['write_errors'] += len(failed)
+            self.stats['last_flush_at'] = datetime.now().isoformat()
+        if written:
+            invalidate_order_lists(f"{written} orders marked as delayed")
+            logger.info(f"Marked {written} orders as delayed")
+        return written
+    
+    def resolve(self) -> bool:
+        """
+        Completa id y created_at de las órdenes que llegaron por upsert, con
+        una consulta por plataforma y chunk. False si alguna quedó sin resolver.
+        """
+        with self.condition:
+            pending = list(self.unresolved)
+        by_platform: Dict[str, List[str]] = {}
+        for platform, external_order_id in pending:
+            by_platform.setdefault(platform, []).append(external_order_id)
+        
+        db = self.db_factory()
+        for platform, external_ids in by_platform.items():
+            for i in range(0, len(external_ids), DEADLINE_RESOLVE_CHUNK_SIZE):
+                chunk = external_ids[i:i + DEADLINE_RESOLVE_CHUNK_SIZE]
+                try:
+                    result = db.table('orders').select('id,external_order_id,created_at').eq(
+                        'platform', platform
+                    ).in_('external_order_id', chunk).execute()
+                except Exception as e:
+                    logger.error(f"Error resolving ids of {len(chunk)} {platform} orders in deadline index: {e}")
+                    continue
+                with self.condition:
+                    for row in result.data or []:
+                        key = (platform, row['external_order_id'])
+                        summary = self.summaries.get(key)
+                        if summary is None or key not in self.unresolved:
+                            continue
+                        summary['id'] = row['id']
+                        summary['created_at'] = row.get('created_at')
+                        self.unresolved.discard(key)
+        
+        with self.condition:
+            return not any(key in self.unresolved for key in pending)
+    
+    def load(self) -> Optional[int]:
+        """
+        Carga las órdenes abiertas desde Supabase, en páginas. Solo queda
+        marcado como cargado si leyó todas; None si alguna página falló.
+        """
+        db = self.db_factory()
+        loaded = 0
+        offset = 0
+        while True:
+            try:
+                result = db.table('orders').select(','.join(SUMMARY_COLUMNS)).in_('current_status', list(OPEN_ORDER_STATUSES)).order('id').range(
+                    offset, offset + DEADLINE_LOAD_PAGE_SIZE - 1
+                ).execute()
+            except Exception as e:
+                logger.error(f"Error loading open orders into deadline index: {e}")
+                return None
+            rows = result.data or []
+            self.observe(rows)
+            loaded += len(rows)
+            if len(rows) < DEADLINE_LOAD_PAGE_SIZE:
+                break
+            offset += DEADLINE_LOAD_PAGE_SIZE
+        
+        self.loaded = True
+        logger.info(f"Deadline index loaded {loaded} open orders")
+        return loaded
+    
+    def _load_with_retry(self) -> bool:
+        """Reintenta load() con backoff hasta que funcione; False si se detuvo antes"""
+        delay = DEADLINE_LOAD_RETRY_SECONDS
+        while self.load() is None:
+            logger.warning(f"Deadline index not loaded, retrying in {delay:.0f}s")
+            retry_at = time.monotonic() + delay
+            with self.condition:
+                # observe() también despierta al thread: se espera el backoff completo
+                while not self.stopping and time.monotonic() < retry_at:
+                    self.condition.wait(retry_at - time.monotonic())
+                if self.stopping:
+                    return False
+            delay = min(delay * 2, DEADLINE_LOAD_RETRY_MAX_SECONDS)
+        return True
+    
+    def _run(self) -> None:
+        # Hasta que cargue, find_open_orders devuelve None y se consulta la tabla
+        if not self._load_with_retry():
+            return
+        next_flush = time.monotonic() + self.flush_seconds
+        next_resolve = time.monotonic()
+        while True:
+            with self.condition:
+                if self.stopping:
+                    break
+                now = time.time()
+                events = self._pop_due(now)
+                resolve_due = bool(self.unresolved) and time.monotonic() >= next_resolve
+                if not events and not resolve_due:
+                    timeout = next_flush - time.monotonic()
+                    if self.heap:
+                        timeout = min(timeout, self.heap[0][0] - now)
+                    if self.unresolved:
+                        timeout = min(timeout, next_resolve - time.monotonic())
+                    self.condition.wait(max(0.0, timeout))
+            if events:
+                self._notify(events)
+            if resolve_due and not self.resolve():
+                # Supabase falló o la orden no apareció: se reintenta con el flush
+                next_resolve = time.monotonic() + self.flush_seconds
+            if time.monotonic() >= next_flush or len(self.pending_writes) >= DEADLINE_LOAD_PAGE_SIZE:
+                self.flush()
+                next_flush = time.monotonic() + self.flush_seconds
+        self.flush()
+    
+    def start(self) -> None:
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, name='deadline-index', daemon=True)
+        self.thread.start()
+    
+    def stop(self, timeout: float = 10.0) -> None:
+        """Detiene el thread escribiendo los atrasos pendientes"""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+    
+    def get_at_risk(self) -> List[Tuple[OrderKey, datetime]]:
+        """Órdenes en riesgo ordenadas por límite de despacho"""
+        with self.condition:
+            return sorted(((key, self.deadlines[key][0]) for key in self.at_risk), key=lambda item: item[1])
+    
+    def get_delayed(self) -> List[Tuple[OrderKey, datetime]]:
+        with self.condition:
+            return sorted(((key, self.deadlines[key][0]) for key in self.delayed), key=lambda item: item[1])
+    
+    def find(
+        self,
+        within_hours: float,
+        platform: Optional[str] = None,
+        shipping_type: Optional[str] = None,
+        columns: Iterable[str] = SUMMARY_COLUMNS
+    ) -> Optional[List[Dict]]:
+        """
+        Órdenes abiertas que vencen entre ahora y within_hours, ordenadas por
+        límite, con esas columnas. None si se piden id o created_at y alguna
+        todavía no los tiene (recién llegada por upsert, sin resolve).
+        """
+        needs_identity = bool({'id', 'created_at'} & set(columns))
+        now = time.time()
+        until = now + within_hours * 3600
+        with self.condition:
+            ranges = []
+            for (partition_platform, partition_shipping), entries in self.partitions.items():
+                if platform and partition_platform != platform:
+                    continue
+                if shipping_type and partition_shipping != shipping_type:
+                    continue
+                start = bisect.bisect_left(entries, (now, ''))
+                end = bisect.bisect_right(entries, until, key=lambda entry: entry[0])
+                if start < end:
+                    ranges.append([
+                        (timestamp, partition_platform, external_order_id)
+                        for timestamp, external_order_id in entries[start:end]
+                    ])
+            
+            orders = []
+            for timestamp, order_platform, external_order_id in heapq.merge(*ranges):
+                key = (order_platform, external_order_id)
+                if needs_identity and key in self.unresolved:
+                    return None
+                summary = self.summaries[key]
+                order = {column: summary.get(column) for column in columns}
+                order['hours_until_deadline'] = round((timestamp - now) / 3600, 2)
+                orders.append(order)
+            return orders
+    
+    def snapshot(self) -> Dict:
+        with self.condition:
+            next_event = None
+            while self.heap:
+                _, _, kind, key, version = self.heap[0]
+                current = self.deadlines.get(key)
+                if current is not None and current[1] == version:
+                    next_event = {'event': kind, 'at': datetime.fromtimestamp(self.heap[0][0], timezone.utc).isoformat()}
+                    break
+                heapq.heappop(self.heap)
+            return {
+                'enabled': True,
+                'loaded': self.loaded,
+                'running': self.thread is not None and self.thread.is_alive(),
+                'open_orders': len(self.deadlines),
+                'at_risk': len(self.at_risk),
+                'delayed': len(self.delayed),
+                'pending_writes': len(self.pending_writes),
+                'unresolved': len(self.unresolved),
+                'heap_size': len(self.heap),
+                'partitions': {f"{p}/{s}": len(entries) for (p, s), entries in self.partitions.items()},
+                'next_event': next_event,
+                **self.stats
+            }
+
+_index: Optional[DeadlineIndex] = None
+_index_lock = threading.Lock()
+
+def get_deadline_index() -> Optional[DeadlineIndex]:
+    """Índice compartido del proceso, None si está deshabilitado"""
+    global _index
+    settings = get_settings()
+    if not settings.DEADLINE_INDEX_ENABLED:
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = DeadlineIndex(
+                    risk_hours=settings.RISK_HOURS_THRESHOLD,
+                    flush_seconds=settings.DEADLINE_FLUSH_SECONDS
+                )
+    return _index
+
+def observe_orders(rows: Iterable[Dict]) -> None:
+    """Informa al índice las órdenes guardadas, si está corriendo"""
+    if _index is not None:
+        _index.observe(rows)
+
+def find_open_orders(
+    within_hours: float,
+    platform: Optional[str] = None,
+    shipping_type: Optional[str] = None,
+    columns: Iterable[str] = SUMMARY_COLUMNS
+) -> Optional[List[Dict]]:
+    """
+    Consulta el índice; None si no está corriendo, no cargó, se piden
+    columnas que no guarda o alguna orden todavía no tiene id
+    """
+    index = _index
+    if index is None or not index.loaded or not set(columns) <= set(SUMMARY_COLUMNS):
+        return None
+    return index.find(within_hours, platform, shipping_type, columns)
+
+def start_deadline_index() -> Optional[DeadlineIndex]:
+    index = get_deadline_index()
+    if index is not None:
+        index.start()
+    return index
+
+def shutdown_deadline_index() -> None:
+    global _index
+    with _index_lock:
+        if _index is not None:
+            _index.stop()
+            _index = None
@@ -0,0 +1,217 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from datetime import datetime
+from app.core.database import get_db
+from app.config import get_settings
+from app.models.enums import Platform
+from app.models.notification import MeliNotification
+from app.services.sync_service import SyncService
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tópicos de MercadoLibre que se procesan y el tipo de recurso que notifican
+MELI_NOTIFICATION_TOPICS = {
+    'orders_v2': 'order',
+    'orders': 'order',
+    'shipments': 'shipment',
+}
+
+class MeliNotificationQueue:
+    """
+    Cola en memoria de notificaciones de MercadoLibre.
+    
+    El webhook solo encola el recurso notificado y responde. Cuando el recurso
+    más antiguo cumple coalesce_seconds en la cola, un worker toma los
+    pendientes en lotes de batch_size y pide las órdenes en paralelo. Las
+    notificaciones repetidas de un recurso que todavía está en la cola se
+    descartan, así una ráfaga de cambios sobre la misma orden cuesta un solo
+    request.
+    
+    La cola no es durable: si el proceso se reinicia, lo pendiente lo
+    recupera el próximo sync incremental.
+    """
+    
+    def __init__(
+        self,
+        process: Callable[[List[str], List[str]], Dict],
+        user_id: Optional[str] = None,
+        coalesce_seconds: float = 5.0,
+        batch_size: int = 20,
+        max_pending: int = 10000
+    ):
+        # process(order_ids, shipment_ids) -> {'succeeded', 'failed', 'queued', ...}
+        self.process = process
+        self.user_id = str(user_id) if user_id else None
+        self.coalesce_seconds = coalesce_seconds
+        self.batch_size = max(1, batch_size)
+        self.max_pending = max_pending
+        
+        self.pending: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.thread: Optional[threading.Thread] = None
+        
+        self.stats = {
+            'received': 0,
+            'accepted': 0,
+            'coalesced': 0,
+            'ignored': 0,
+            'dropped': 0,
+            'batches': 0,
+            'orders_saved': 0,
+            'orders_failed': 0,
+            'last_batch_at': None,
+            'last_batch_ms': None,
+            'last_error': None
+        }
+    
+    def enqueue(self, notification: MeliNotification) -> str:
+        """
+        Encola el recurso de una notificación sin hacer I/O.
+        Retorna 'accepted', 'coalesced', 'ignored' o 'dropped'.
+        """
+        kind = MELI_NOTIFICATION_TOPICS.get(notification.topic)
+        resource_id = notification.resource.rstrip('/').rsplit('/', 1)[-1]
+        with self.condition:
+            self.stats['received'] += 1
+            if kind is None or not resource_id or (
+                self.user_id and str(notification.user_id) != self.user_id
+            ):
+                outcome = 'ignored'
+            elif (kind, resource_id) in self.pending:
+                outcome = 'coalesced'
+            elif len(self.pending) >= self.max_pending:
+                outcome = 'dropped'
+            else:
+                self.pending[(kind, resource_id)] = time.monotonic()
+                self.condition.notify()
+                outcome = 'accepted'
+            self.stats[outcome] += 1
+        
+        if outcome == 'dropped':
+            logger.warning(f"ML notification queue full, dropping {notification.resource}")
+        return outcome
+    
+    def _take_batch(self) -> List[Tuple[str, str]]:
+        """Espera a que el recurso más antiguo cumpla coalesce_seconds y toma un lote"""
+        with self.condition:
+            while not self.stopping:
+                if self.pending:
+                    oldest = next(iter(self.pending.values()))
+                    wait = oldest + self.coalesce_seconds - time.monotonic()
+                    if wait <= 0:
+                        break
+                else:
+                    wait = None
+                self.condition.wait(wait)
+            
+            batch = []
+            while self.pending and len(batch) < self.batch_size:
+                key, _ = self.pending.popitem(last=False)
+                batch.append(key)
+            return batch
+    
+    def _process_batch(self, batch: List[Tuple[str, str]]) -> None:
+        order_ids = [resource_id for kind, resource_id in batch if kind == 'order']
+        shipment_ids = [resource_id for kind, resource_id in batch if kind == 'shipment']
+        start = time.monotonic()
+        try:
+            result = self.process(order_ids, shipment_ids)
+            saved = result['succeeded'] + result['skipped'] + result['queued']
+            failed = result['failed']
+            error = result['errors'][-1] if result['errors'] else None
+        except Exception as e:
+            logger.error(f"Error processing {len(batch)} ML notifications: {e}")
+            saved, failed, error = 0, len(batch), str(e)
+        
+        with self.condition:
+            self.stats['batches'] += 1
+            self.stats['orders_saved'] += saved
+            self.stats['orders_failed'] += failed
+            self.stats['last_batch_at'] = datetime.now().isoformat()
+            self.stats['last_batch_ms'] = round((time.monotonic() - start) * 1000, 1)
+            if error:
+                self.stats['last_error'] = error
+    
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                if self.stopping:
+                    return
+                continue
+            self._process_batch(batch)
+    
+    def start(self) -> None:
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, name='meli-notifications', daemon=True)
+        self.thread.start()
+    
+    def stop(self, timeout: float = 10.0) -> None:
+        """Detiene el worker procesando lo que quede en cola, hasta timeout segundos"""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+    
+    def metrics(self) -> Dict:
+        with self.condition:
+            oldest = next(iter(self.pending.values()), None)
+            return {
+                'enabled': True,
+                'running': self.thread is not None and self.thread.is_alive(),
+                'pending': len(self.pending),
+                'oldest_pending_seconds': round(time.monotonic() - oldest, 1) if oldest else 0.0,
+                **self.stats
+            }
+
+def _process_meli_notifications(order_ids: List[str], shipment_ids: List[str]) -> Dict:
+    """Pide las órdenes notificadas y las guarda como en un sync"""
+    sync_service = SyncService(get_db())
+    raw_orders = sync_service.mercadolibre.fetch_orders_by_id(order_ids, shipment_ids)
+    result = sync_service.ingest_orders(Platform.MERCADOLIBRE, raw_orders)
+    # Los recursos que no se pudieron pedir también cuentan como fallidos
+    result['failed'] += len(sync_service.mercadolibre.fetch_errors)
+    result['errors'].extend(sync_service.mercadolibre.fetch_errors)
+    return result
+
+_queue: Optional[MeliNotificationQueue] = None
+_queue_lock = threading.Lock()
+
+def get_meli_notification_queue() -> Optional[MeliNotificationQueue]:
+    """Cola compartida del proceso, None si el webhook está deshabilitado"""
+    global _queue
+    settings = get_settings()
+    if not settings.MELI_WEBHOOK_ENABLED:
+        return None
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = MeliNotificationQueue(
+                    _process_meli_notifications,
+                    user_id=settings.MELI_USER_ID,
+                    coalesce_seconds=settings.MELI_NOTIFICATION_COALESCE_SECONDS,
+                    batch_size=settings.MELI_NOTIFICATION_BATCH_SIZE,
+                    max_pending=settings.MELI_NOTIFICATION_MAX_PENDING
+                )
+    return _queue
+
+def start_meli_notification_queue() -> Optional[MeliNotificationQueue]:
+    queue = get_meli_notification_queue()
+    if queue is not None:
+        queue.start()
+    return queue
+
+def shutdown_meli_notification_queue() -> None:
+    global _queue
+    with _queue_lock:
+        if _queue is not None:
+            _queue.stop()
+            _queue = None
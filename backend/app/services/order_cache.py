@@ -0,0 +1,154 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from collections import OrderedDict
+from datetime import datetime
+from app.config import get_settings
+import asyncio
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class OrderListCache:
+    """
+    Cache read-through con TTL y LRU para los listados de órdenes.
+    
+    Los dashboards piden las mismas vistas cada pocos segundos: dentro del
+    TTL se responden desde memoria y, si varios lectores piden una clave
+    vencida a la vez, solo uno consulta Supabase y el resto espera ese
+    resultado. Cada escritura de órdenes llama a invalidate(), así que la
+    carga sobre la base sigue al ritmo de cambios y no al de lectores; el
+    TTL solo cubre lo que cambia con el reloj (el día, la ventana de riesgo).
+    
+    Una carga que empezó antes de una invalidación no se guarda.
+    """
+    
+    def __init__(self, ttl_seconds: float = 15.0, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # key -> (valor, vence_en)
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Cargas en curso (un solo event loop por proceso)
+        self.loading: Dict[Hashable, asyncio.Task] = {}
+        self.generation = 0
+        self.lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.load_errors = 0
+        self.last_invalidated_at: Optional[str] = None
+    
+    def _lookup(self, key: Hashable) -> tuple:
+        """(True, valor) si key está vigente; se llama con el lock tomado"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[1] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[0]
+            del self.entries[key]
+            self.expired += 1
+        return False, None
+    
+    def _store(self, key: Hashable, value: Any, generation: int) -> None:
+        """Guarda value salvo que hubo una invalidación desde que empezó la carga; con el lock tomado"""
+        if self.generation == generation:
+            self.entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+    
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Valor cacheado de key o el resultado de loader(); los errores no se
+        cachean. La carga corre en su propia task, así la cancelación de la
+        request que la inició no la corta para los demás que la esperan.
+        """
+        with self.lock:
+            hit, value = self._lookup(key)
+            if hit:
+                return value
+            
+            task = self.loading.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._load(key, loader, self.generation))
+                self.loading[key] = task
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        return await asyncio.shield(task)
+    
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], generation: int) -> Any:
+        current = asyncio.current_task()
+        try:
+            value = await loader()
+        except Exception:
+            with self.lock:
+                self.load_errors += 1
+                if self.loading.get(key) is current:
+                    del self.loading[key]
+            raise
+        
+        with self.lock:
+            if self.loading.get(key) is current:
+                del self.loading[key]
+            self._store(key, value, generation)
+        return value
+    
+    def invalidate(self, reason: str = '') -> None:
+        """Descarta todos los listados; las cargas en curso ya no se guardan"""
+        with self.lock:
+            self.entries.clear()
+            self.loading.clear()
+            self.generation += 1
+            self.invalidations += 1
+            self.last_invalidated_at = datetime.now().isoformat()
+        if reason:
+            logger.debug(f"Order list cache invalidated: {reason}")
+    
+    def snapshot(self) -> Dict:
+        with self.lock:
+            lookups = self.hits + self.coalesced + self.misses
+            return {
+                'enabled': True,
+                'entries': len(self.entries),
+                'ttl_seconds': self.ttl_seconds,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'coalesced': self.coalesced,
+                'misses': self.misses,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'load_errors': self.load_errors,
+                'last_invalidated_at': self.last_invalidated_at,
+                'hit_ratio': round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0
+            }
+
+_cache: Optional[OrderListCache] = None
+_cache_lock = threading.Lock()
+
+def get_order_list_cache() -> Optional[OrderListCache]:
+    """Cache compartido del proceso, None si está deshabilitado"""
+    global _cache
+    settings = get_settings()
+    if not settings.ORDER_LIST_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = OrderListCache(
+                    ttl_seconds=settings.ORDER_LIST_CACHE_TTL_SECONDS,
+                    max_entries=settings.ORDER_LIST_CACHE_MAX_ENTRIES
+                )
+    return _cache
+
+def invalidate_order_lists(reason: str = '') -> None:
+    """Invalida los listados cacheados tras una escritura de órdenes"""
+    if _cache is not None:
+        _cache.invalidate(reason)
@@ -0,0 +1,392 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from datetime import datetime
+from pathlib import Path
+from supabase import Client
+from app.core.database import get_db
+from app.config import get_settings
+from app.services.order_service import OrderService
+import json
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tope del backoff entre reintentos de una misma orden
+OUTBOX_MAX_BACKOFF_SECONDS = 300
+
+OUTBOX_SCHEMA = """
+create table if not exists order_outbox (
+    platform text not null,
+    external_order_id text not null,
+    payload text not null,
+    content_hash text not null,
+    enqueued_at real not null,
+    attempts integer not null default 0,
+    next_attempt_at real not null,
+    last_error text,
+    dead integer not null default 0,
+    primary key (platform, external_order_id)
+);
+create index if not exists order_outbox_due on order_outbox (dead, next_attempt_at);
+"""
+
+class OutboxReceipt:
+    """
+    Resultado de un enqueue: se completa a medida que el flusher escribe sus
+    filas en Supabase. Una orden cuenta como escrita aunque se haya enviado
+    una versión encolada después, que la reemplaza; una versión que el
+    flusher leyó antes de este enqueue no la completa.
+    """
+    
+    def __init__(self, pending: Dict[Tuple[str, str], str], seq: int, lock: threading.Lock):
+        # content_hash encolado por cada orden pendiente
+        self.pending = pending
+        self.seq = seq
+        self.lock = lock
+        self.succeeded = 0
+        self.skipped = 0
+        self.failed = 0
+        self.errors: List[str] = []
+        self.done = threading.Event()
+        if not pending:
+            self.done.set()
+    
+    def _settle(
+        self,
+        key: Tuple[str, str],
+        content_hash: str,
+        read_seq: int,
+        outcome: str,
+        error: Optional[str] = None
+    ) -> None:
+        """
+        Registra el resultado final de una orden; con el lock del outbox tomado.
+        La fila enviada vale si es la misma versión o si el flusher la leyó
+        después de este enqueue (entonces es esta o una que la reemplazó).
+        """
+        if key not in self.pending:
+            return
+        if self.pending[key] != content_hash and self.seq > read_seq:
+            return
+        del self.pending[key]
+        setattr(self, outcome, getattr(self, outcome) + 1)
+        if error:
+            self.errors.append(f"{key[1]}: {error}")
+        if not self.pending:
+            self.done.set()
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """True si todas sus filas quedaron escritas o descartadas (dead)"""
+        return self.done.wait(timeout)
+    
+    def summary(self) -> Dict:
+        with self.lock:
+            return {
+                'succeeded': self.succeeded,
+                'skipped': self.skipped,
+                'failed': self.failed,
+                'pending': len(self.pending),
+                'errors': list(self.errors)
+            }
+
+class OrderOutbox:
+    """
+    Outbox local (SQLite en modo WAL) para los upserts de órdenes.
+    
+    El sync deja las filas acá y sigue sin esperar a Supabase; un thread
+    flusher las drena en lotes grandes con OrderService.bulk_upsert_rows. La
+    clave es (platform, external_order_id): si una orden se vuelve a encolar
+    antes de enviarse, la versión nueva reemplaza a la anterior, y como el
+    upsert es idempotente reenviar una fila no tiene efectos.
+    
+    Las filas que fallan se reintentan con backoff exponencial; después de
+    max_attempts quedan marcadas como dead para revisarlas sin frenar al resto.
+    
+    Encolar no equivale a guardar: enqueue() devuelve un OutboxReceipt que
+    el sync espera antes de mover su cursor, así una fila que termina dead
+    no queda detrás del cursor sin volver a pedirse.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        db_factory: Callable[[], Client] = get_db,
+        batch_size: int = 1000,
+        chunk_size: int = 500,
+        flush_interval: float = 2.0,
+        max_attempts: int = 10
+    ):
+        if path != ':memory:':
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.db_factory = db_factory
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL: lecturas y escrituras no se bloquean entre sí; synchronous=normal
+        # no pierde datos si se cae el proceso, solo ante un corte del sistema
+        self.conn.execute('pragma journal_mode=wal')
+        self.conn.execute('pragma synchronous=normal')
+        self.conn.executescript(OUTBOX_SCHEMA)
+        self.lock = threading.Lock()
+        self.receipts: List[OutboxReceipt] = []
+        # Número del último enqueue, para saber qué versiones vio cada lectura
+        self.enqueue_seq = 0
+        
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        
+        self.stats = {
+            'enqueued_total': 0,
+            'flushed_total': 0,
+            'skipped_total': 0,
+            'failed_total': 0,
+            'batches': 0,
+            'last_flush_at': None,
+            'last_flush_ms': None,
+            'last_error': None
+        }
+    
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+    
+    def enqueue(self, rows: List[Dict]) -> OutboxReceipt:
+        """Guarda filas preparadas (prepare_order_rows) para enviarlas a Supabase"""
+        pending = {(row['platform'], row['external_order_id']): row['content_hash'] for row in rows}
+        if not rows:
+            return OutboxReceipt(pending, self.enqueue_seq, self.lock)
+        now = time.time()
+        params = [
+            (row['platform'], row['external_order_id'], json.dumps(row), row['content_hash'], now, now)
+            for row in rows
+        ]
+        with self.lock, self.conn:
+            # enqueued_at conserva la primera vez que se encoló, para medir el lag real
+            self.conn.executemany(
+                """
+                insert into order_outbox
+                    (platform, external_order_id, payload, content_hash, enqueued_at, next_attempt_at)
+                values (?, ?, ?, ?, ?, ?)
+                on conflict (platform, external_order_id) do update set
+                    payload = excluded.payload,
+                    content_hash = excluded.content_hash,
+                    attempts = 0,
+                    next_attempt_at = excluded.next_attempt_at,
+                    last_error = null,
+                    dead = 0
+                """,
+                params
+            )
+            self.stats['enqueued_total'] += len(rows)
+            self.enqueue_seq += 1
+            receipt = OutboxReceipt(pending, self.enqueue_seq, self.lock)
+            self.receipts.append(receipt)
+        self.wake.set()
+        return receipt
+    
+    def _due_rows(self) -> Tuple[int, List[Dict]]:
+        """Filas a enviar y el número del último enqueue visible al leerlas"""
+        with self.lock:
+            cursor = self.conn.execute(
+                """
+                select payload from order_outbox
+                where dead = 0 and next_attempt_at <= ?
+                order by enqueued_at
+                limit ?
+                """,
+                (time.time(), self.batch_size)
+            )
+            return self.enqueue_seq, [json.loads(payload) for (payload,) in cursor]
+    
+    def flush_once(self) -> Optional[Dict]:
+        """
+        Envía un lote de filas pendientes. Retorna el resultado del upsert, o
+        None si no había nada para enviar.
+        """
+        read_seq, rows = self._due_rows()
+        if not rows:
+            return None
+        
+        start = time.monotonic()
+        try:
+            result = OrderService(self.db_factory()).bulk_upsert_rows(rows, chunk_size=self.chunk_size)
+        except Exception as e:
+            logger.error(f"Error flushing {len(rows)} orders from outbox: {e}")
+            result = {
+                'succeeded': 0,
+                'failed': len(rows),
+                'skipped': 0,
+                'errors': [str(e)],
+                'failed_orders': {(row['platform'], row['external_order_id']): str(e) for row in rows}
+            }
+        
+        failed = result['failed_orders']
+        skipped = result.get('skipped_orders', set())
+        now = time.time()
+        with self.lock, self.conn:
+            # Se compara content_hash para no borrar una versión encolada durante el envío
+            self.conn.executemany(
+                """
+                delete from order_outbox
+                where platform = ? and external_order_id = ? and content_hash = ?
+                """,
+                [
+                    (row['platform'], row['external_order_id'], row['content_hash'])
+                    for row in rows
+                    if (row['platform'], row['external_order_id']) not in failed
+                ]
+            )
+            self.conn.executemany(
+                """
+                update order_outbox set
+                    attempts = attempts + 1,
+                    last_error = ?,
+                    next_attempt_at = ? + min(?, ? * (1 << attempts)),
+                    dead = attempts + 1 >= ?
+                where platform = ? and external_order_id = ? and content_hash = ?
+                """,
+                [
+                    (
+                        failed[(row['platform'], row['external_order_id'])],
+                        now, OUTBOX_MAX_BACKOFF_SECONDS, self.flush_interval, self.max_attempts,
+                        row['platform'], row['external_order_id'], row['content_hash']
+                    )
+                    for row in rows
+                    if (row['platform'], row['external_order_id']) in failed
+                ]
+            )
+            
+            # Resultado final de cada orden del lote; las que fallaron y se van a
+            # reintentar siguen pendientes, las que llegaron a dead ya no se escriben
+            outcomes = {}
+            for row in rows:
+                key = (row['platform'], row['external_order_id'])
+                if key not in failed:
+                    outcomes[key] = (row['content_hash'], 'skipped' if key in skipped else 'succeeded', None)
+                elif self.conn.execute(
+                    """
+                    select 1 from order_outbox
+                    where platform = ? and external_order_id = ? and content_hash = ? and dead = 1
+                    """,
+                    (*key, row['content_hash'])
+                ).fetchone():
+                    outcomes[key] = (row['content_hash'], 'failed', failed[key])
+            for receipt in self.receipts:
+                for key in receipt.pending.keys() & outcomes.keys():
+                    content_hash, outcome, error = outcomes[key]
+                    receipt._settle(key, content_hash, read_seq, outcome, error)
+            self.receipts = [receipt for receipt in self.receipts if not receipt.done.is_set()]
+            
+            self.stats['flushed_total'] += result['succeeded']
+            self.stats['skipped_total'] += result['skipped']
+            self.stats['failed_total'] += result['failed']
+            self.stats['batches'] += 1
+            self.stats['last_flush_at'] = datetime.now().isoformat()
+            self.stats['last_flush_ms'] = round((time.monotonic() - start) * 1000, 1)
+            if result['errors']:
+                self.stats['last_error'] = result['errors'][-1]
+        return result
+    
+    def _run(self) -> None:
+        while not self.stopping.is_set():
+            self.wake.clear()
+            try:
+                result = self.flush_once()
+            except Exception as e:
+                logger.error(f"Order outbox flush failed: {e}")
+                result = None
+            
+            # Sin filas pendientes o sin ningún avance: esperar al próximo enqueue o intervalo
+            if not result or not (result['succeeded'] + result['skipped']):
+                self.wake.wait(self.flush_interval)
+    
+    def start(self) -> None:
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name='order-outbox', daemon=True)
+        self.thread.start()
+        logger.info(f"Order outbox flusher started ({self.path})")
+    
+    def stop(self, timeout: float = 10.0) -> None:
+        """Detiene el flusher; lo que quede pendiente se envía en el próximo arranque"""
+        self.stopping.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+        with self.lock:
+            self.conn.close()
+    
+    def retry_dead(self) -> int:
+        """Vuelve a encolar las órdenes que agotaron sus reintentos"""
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "update order_outbox set dead = 0, attempts = 0, next_attempt_at = ? where dead = 1",
+                (time.time(),)
+            )
+            count = cursor.rowcount
+        self.wake.set()
+        return count
+    
+    def metrics(self) -> Dict:
+        """Profundidad, lag y contadores del outbox"""
+        now = time.time()
+        with self.lock:
+            depth, retrying, oldest = self.conn.execute(
+                "select count(*), sum(attempts > 0), min(enqueued_at) from order_outbox where dead = 0"
+            ).fetchone()
+            dead = self.conn.execute("select count(*) from order_outbox where dead = 1").fetchone()[0]
+            stats = dict(self.stats)
+        
+        return {
+            'enabled': True,
+            'running': self.thread is not None and self.thread.is_alive(),
+            'depth': depth,
+            'retrying': retrying or 0,
+            'dead': dead,
+            'lag_seconds': round(now - oldest, 1) if oldest else 0.0,
+            'oldest_enqueued_at': datetime.fromtimestamp(oldest).isoformat() if oldest else None,
+            **stats
+        }
+
+_outbox: Optional[OrderOutbox] = None
+_outbox_lock = threading.Lock()
+
+def get_order_outbox() -> Optional[OrderOutbox]:
+    """Outbox compartido del proceso, None si está deshabilitado"""
+    global _outbox
+    settings = get_settings()
+    if not settings.ORDER_OUTBOX_ENABLED:
+        return None
+    if _outbox is None:
+        with _outbox_lock:
+            if _outbox is None:
+                _outbox = OrderOutbox(
+                    settings.ORDER_OUTBOX_PATH,
+                    batch_size=settings.ORDER_OUTBOX_BATCH_SIZE,
+                    chunk_size=settings.ORDER_UPSERT_CHUNK_SIZE,
+                    flush_interval=settings.ORDER_OUTBOX_FLUSH_INTERVAL_SECONDS,
+                    max_attempts=settings.ORDER_OUTBOX_MAX_ATTEMPTS
+                )
+    return _outbox
+
+def start_order_outbox() -> Optional[OrderOutbox]:
+    outbox = get_order_outbox()
+    if outbox is not None:
+        outbox.start()
+    return outbox
+
+def shutdown_order_outbox() -> None:
+    global _outbox
+    with _outbox_lock:
+        if _outbox is not None:
+            _outbox.stop()
+            _outbox = None
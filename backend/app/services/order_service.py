@@ -2,120 +2,405 @@
 # =====================================================
 # backend/app/services/order_service.py
 # =====================================================
-from typing import List, Optional, Dict
-from datetime import datetime
+# Requiere las columnas orders.content_hash e items:
+#
+#   alter table orders add column content_hash text;
+#   alter table orders add column items jsonb;
+#
+# y de índices para la paginación por cursor de get_orders_page:
+#
+#   create index orders_created_at_id_idx on orders (created_at desc, id desc);
+#   create index orders_platform_created_at_id_idx on orders (platform, created_at desc, id desc);
+#   create index orders_status_created_at_id_idx on orders (current_status, created_at desc, id desc);
+from typing import Awaitable, Callable, List, Optional, Dict, Tuple
+from datetime import datetime, timedelta, timezone
 from uuid import UUID
-from supabase import Client
-from app.models.order import Order, OrderCreate
+from postgrest.types import ReturnMethod
+from supabase import AsyncClient, Client
+from app.models.order import Order, OrderCreate, OrderDetail
 from app.models.enums import OrderStatus
-from app.utils.date_helpers import is_delayed
+from app.utils.date_helpers import is_delayed, parse_iso_date
+from app.utils.hashing import order_fingerprint
+from app.utils.validators import validate_orders_batch, dump_orders_batch
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_filter
+from app.config import get_settings
+from app.services.deadline_index import OPEN_ORDER_STATUSES, SUMMARY_COLUMNS, find_open_orders, observe_orders
+from app.services.order_cache import get_order_list_cache, invalidate_order_lists
+from app.services.dashboard_counters import record_orders
+import httpx
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Máximo de external_order_id por consulta de hashes (límite de largo de URL)
+HASH_LOOKUP_CHUNK_SIZE = 200
+
+# Columnas por defecto de los listados: lo que muestran las vistas y el modal
+# de detalle. raw_data (la orden completa de la plataforma) solo viene en el
+# detalle por ID
+ORDER_LIST_COLUMNS = SUMMARY_COLUMNS + ('hours_delayed',)
+
+DEFAULT_LIST_FIELDS = {
+    'orders_today': ORDER_LIST_COLUMNS,
+    'orders_delayed': ORDER_LIST_COLUMNS + ('delay_detected_at',),
+    'orders_at_risk': SUMMARY_COLUMNS,
+    'orders_to_ship': ORDER_LIST_COLUMNS,
+    'orders_delivered': ORDER_LIST_COLUMNS + ('updated_at',),
+    'orders': ORDER_LIST_COLUMNS + ('updated_at',)
+}
+
+# Campos que se pueden pedir con fields=
+SELECTABLE_FIELDS = frozenset(Order.model_fields)
+
+# Columnas que un listado necesita aunque no se pidan: el cursor y el cálculo de horas restantes
+REQUIRED_LIST_FIELDS = {
+    'orders': ('id', 'created_at'),
+    'orders_at_risk': ('limite_despacho',)
+}
+
+def resolve_fields(view: str, fields: Optional[str] = None) -> Tuple[str, ...]:
+    """
+    Columnas a pedir para un listado: las de fields= (separadas por coma) o
+    las por defecto de la vista. ValueError si se pide un campo desconocido.
+    """
+    if not fields:
+        return DEFAULT_LIST_FIELDS[view]
+    requested = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in requested if field not in SELECTABLE_FIELDS]
+    if unknown or not requested:
+        raise ValueError(f"Unknown fields: {', '.join(unknown) or fields}")
+    return tuple(dict.fromkeys(requested + list(REQUIRED_LIST_FIELDS.get(view, ()))))
+
 class OrderService:
     def __init__(self, db: Client):
         self.db = db
     
-    def create_or_update_order(self, order_data: OrderCreate) -> Optional[Order]:
-        """Crea o actualiza una orden"""
+    def _finalize_row(self, order_data: OrderCreate, data: Dict) -> Dict:
+        """Agrega is_delayed, delay_detected_at y content_hash a una fila serializada"""
+        data['is_delayed'] = is_delayed(order_data.limite_despacho)
+        if data['is_delayed'] and 'delay_detected_at' not in data:
+            data['delay_detected_at'] = datetime.now().isoformat()
+        
+        data['content_hash'] = order_fingerprint(data)
+        return data
+    
+    def prepare_order_rows(self, orders_data: List[Dict]) -> Tuple[List[Dict], List[str]]:
+        """
+        Valida una página de órdenes mapeadas y la serializa a filas listas
+        para Supabase, con una sola validación y un solo dump para toda la
+        página. Retorna (filas, errores de las órdenes descartadas).
+        """
+        orders, validation_errors = validate_orders_batch(orders_data)
+        errors = [
+            f"{orders_data[index].get('external_order_id')}: {message}"
+            for index, message in validation_errors
+        ]
+        
+        rows = []
+        for order, data in zip(orders, dump_orders_batch(orders)):
+            try:
+                rows.append(self._finalize_row(order, data))
+            except Exception as e:
+                errors.append(f"{order.external_order_id}: {e}")
+        return rows, errors
+    
+    def _upsert_rows(self, rows: List[Dict]) -> None:
+        """Upsert de un lote de filas en un solo request, sin devolver las filas"""
+        self.db.table('orders').upsert(
+            rows,
+            on_conflict='platform,external_order_id',
+            returning=ReturnMethod.minimal
+        ).execute()
+    
+    def _fail_rows(self, rows: List[Dict], result: Dict, error: Exception) -> None:
+        result['failed'] += len(rows)
+        for row in rows:
+            result['failed_orders'][(row['platform'], row['external_order_id'])] = str(error)
+        result['errors'].extend(f"{row['external_order_id']}: {error}" for row in rows)
+    
+    def _upsert_chunk(self, rows: List[Dict], result: Dict) -> None:
+        """
+        Guarda un chunk; si falla, lo parte en mitades para aislar las filas malas.
+        
+        Un error de red o timeout no es culpa de ninguna fila: el chunk entero
+        se marca como fallido sin dividirlo, para no multiplicar los requests
+        mientras Supabase no responde.
+        """
         try:
-            data = order_data.model_dump(exclude_none=True)
-            data['platform'] = data['platform'].value
-            data['shipping_type'] = data['shipping_type'].value
-            data['current_status'] = data['current_status'].value
-            
-            # Convertir datetimes a ISO string
-            for field in ['limite_despacho', 'promised_delivery', 'created_at']:
-                if field in data and isinstance(data[field], datetime):
-                    data[field] = data[field].isoformat()
-            
-            # Verificar si está atrasada
-            if 'limite_despacho' in data:
-                limite = datetime.fromisoformat(data['limite_despacho'].replace('Z', '+00:00'))
-                data['is_delayed'] = is_delayed(limite)
-                if data['is_delayed'] and 'delay_detected_at' not in data:
-                    data['delay_detected_at'] = datetime.now().isoformat()
-            
-            result = self.db.table('orders').upsert(
-                data,
-                on_conflict='platform,external_order_id'
-            ).execute()
-            
-            if result.data:
-                logger.info(f"Order {order_data.order_number} saved")
-                return Order(**result.data[0])
-            return None
-            
+            self._upsert_rows(rows)
+            result['succeeded'] += len(rows)
+            return
+        except httpx.TransportError as e:
+            logger.error(f"Error saving chunk of {len(rows)} orders, database unreachable: {e}")
+            self._fail_rows(rows, result, e)
+            return
         except Exception as e:
-            logger.error(f"Error saving order: {e}")
-            return None
+            if len(rows) == 1:
+                self._fail_rows(rows, result, e)
+                return
+            logger.error(f"Error saving chunk of {len(rows)} orders, splitting: {e}")
+        
+        middle = len(rows) // 2
+        self._upsert_chunk(rows[:middle], result)
+        self._upsert_chunk(rows[middle:], result)
     
-    def get_order_by_id(self, order_id: UUID) -> Optional[Order]:
-        """Obtiene una orden por ID"""
+    def get_content_hashes(self, platform: str, external_ids: List[str]) -> Dict[str, str]:
+        """content_hash guardado por external_order_id, consultado en chunks"""
+        hashes = {}
+        for i in range(0, len(external_ids), HASH_LOOKUP_CHUNK_SIZE):
+            chunk = external_ids[i:i + HASH_LOOKUP_CHUNK_SIZE]
+            result = self.db.table('orders').select('external_order_id,content_hash').eq(
+                'platform', platform
+            ).in_('external_order_id', chunk).execute()
+            for row in result.data or []:
+                if row.get('content_hash'):
+                    hashes[row['external_order_id']] = row['content_hash']
+        return hashes
+    
+    def _filter_unchanged(self, rows: List[Dict]) -> List[Dict]:
+        """Descarta las filas cuyo content_hash coincide con el guardado"""
+        by_platform: Dict[str, List[Dict]] = {}
+        for row in rows:
+            by_platform.setdefault(row['platform'], []).append(row)
+        
+        changed = []
+        for platform, platform_rows in by_platform.items():
+            try:
+                stored = self.get_content_hashes(
+                    platform, [row['external_order_id'] for row in platform_rows]
+                )
+            except Exception as e:
+                logger.error(f"Error fetching content hashes, writing all {platform} orders: {e}")
+                stored = {}
+            changed.extend(
+                row for row in platform_rows
+                if stored.get(row['external_order_id']) != row['content_hash']
+            )
+        return changed
+    
+    def bulk_upsert_rows(
+        self,
+        rows: List[Dict],
+        chunk_size: int = 500,
+        skip_unchanged: bool = True
+    ) -> Dict:
+        """
+        Crea o actualiza filas preparadas (prepare_order_rows) en chunks de
+        chunk_size filas. Es el único camino de escritura de órdenes: lo usan
+        el sync y el flusher del outbox.
+        
+        Con skip_unchanged, las órdenes cuyo content_hash coincide con el
+        guardado no se reescriben y se cuentan en skipped.
+        
+        Las filas se agrupan por conjunto de columnas antes de enviarlas, para
+        que una columna ausente (None) no sobrescriba el valor guardado. Si un
+        chunk falla se divide en mitades hasta aislar las filas con problemas.
+        
+        Retorna {'succeeded': int, 'failed': int, 'skipped': int, 'errors': List[str],
+        'failed_orders': Dict[(platform, external_order_id), error],
+        'skipped_orders': Set[(platform, external_order_id)]}; succeeded cuenta
+        solo las filas efectivamente escritas.
+        """
+        result = {'succeeded': 0, 'failed': 0, 'skipped': 0, 'errors': [], 'failed_orders': {}, 'skipped_orders': set()}
+        
+        to_write = rows
+        if skip_unchanged and rows:
+            to_write = self._filter_unchanged(rows)
+            written = {(row['platform'], row['external_order_id']) for row in to_write}
+            result['skipped_orders'] = {
+                (row['platform'], row['external_order_id']) for row in rows
+            } - written
+            result['skipped'] = len(rows) - len(to_write)
+        
+        groups: Dict[Tuple[str, ...], List[Dict]] = {}
+        for row in to_write:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+        
+        chunk_size = max(1, chunk_size)
+        for group in groups.values():
+            for i in range(0, len(group), chunk_size):
+                self._upsert_chunk(group[i:i + chunk_size], result)
+        
+        # El índice de plazos y los contadores siguen el estado guardado, no el que falló al escribirse
+        failed = result['failed_orders']
+        saved = [row for row in rows if (row['platform'], row['external_order_id']) not in failed]
+        observe_orders(saved)
+        record_orders(saved)
+        if result['succeeded']:
+            invalidate_order_lists(f"{result['succeeded']} orders upserted")
+        
+        logger.info(
+            f"Bulk upsert: {result['succeeded']} saved, {result['skipped']} unchanged, "
+            f"{result['failed']} failed"
+        )
+        return result
+
+class AsyncOrderService:
+    """
+    Lecturas de órdenes para los endpoints, con el cliente async de Supabase:
+    mientras espera a PostgREST el event loop atiende otras requests. Las
+    escrituras siguen en OrderService, que usan el sync y el outbox desde
+    sus threads.
+    """
+    
+    def __init__(self, db: AsyncClient):
+        self.db = db
+    
+    async def get_order_by_id(self, order_id: UUID) -> Optional[OrderDetail]:
+        """Obtiene una orden por ID, con raw_data"""
         try:
-            result = self.db.table('orders').select('*').eq('id', str(order_id)).execute()
+            result = await self.db.table('orders').select('*').eq('id', str(order_id)).execute()
             if result.data:
-                return Order(**result.data[0])
+                return OrderDetail(**result.data[0])
             return None
         except Exception as e:
             logger.error(f"Error fetching order: {e}")
             return None
     
-    def get_orders_today(self) -> List[Dict]:
-        """Órdenes del día"""
+    async def _cached_list(self, key: Tuple, loader: Callable[[], Awaitable[List[Dict]]]) -> List[Dict]:
+        """Listado desde el cache de listados (si está habilitado) o directo de Supabase"""
+        cache = get_order_list_cache()
+        if cache is None:
+            return await loader()
+        return await cache.get_or_load(key, loader)
+    
+    async def _select_view(self, view: str, columns: Tuple[str, ...]) -> List[Dict]:
+        result = await self.db.table(view).select(','.join(columns)).execute()
+        return result.data or []
+    
+    async def _view_list(self, view: str, fields: Optional[str]) -> List[Dict]:
+        columns = resolve_fields(view, fields)
         try:
-            result = self.db.table('orders_today').select('*').execute()
-            return result.data or []
+            return await self._cached_list((view, columns), lambda: self._select_view(view, columns))
         except Exception as e:
             logger.error(f"Error: {e}")
             return []
     
-    def get_delayed_orders(self) -> List[Dict]:
+    async def get_orders_today(self, fields: Optional[str] = None) -> List[Dict]:
+        """Órdenes del día"""
+        return await self._view_list('orders_today', fields)
+    
+    async def get_delayed_orders(self, fields: Optional[str] = None) -> List[Dict]:
         """Órdenes atrasadas"""
-        try:
-            result = self.db.table('orders_delayed').select('*').execute()
-            return result.data or []
-        except Exception as e:
-            logger.error(f"Error: {e}")
-            return []
+        return await self._view_list('orders_delayed', fields)
     
-    def get_orders_at_risk(self) -> List[Dict]:
-        """Órdenes en riesgo (PREVENTIVO)"""
+    async def get_orders_at_risk(
+        self,
+        within_hours: Optional[float] = None,
+        platform: Optional[str] = None,
+        shipping_type: Optional[str] = None,
+        fields: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Órdenes abiertas que vencen en las próximas within_hours (PREVENTIVO),
+        ordenadas por límite. Se responden desde el índice de plazos; si no
+        está cargado, o se piden campos que el índice no guarda, se consulta
+        la tabla con los mismos filtros.
+        """
+        columns = resolve_fields('orders_at_risk', fields)
+        if within_hours is None:
+            within_hours = get_settings().RISK_HOURS_THRESHOLD
+        
+        orders = find_open_orders(within_hours, platform, shipping_type, columns)
+        if orders is not None:
+            return orders
+        
         try:
-            result = self.db.table('orders_at_risk').select('*').execute()
-            return result.data or []
+            return await self._cached_list(
+                ('orders_at_risk', columns, within_hours, platform, shipping_type),
+                lambda: self._select_at_risk(columns, within_hours, platform, shipping_type)
+            )
         except Exception as e:
             logger.error(f"Error: {e}")
             return []
     
-    def get_all_orders(self, limit: int = 100, offset: int = 0) -> List[Dict]:
-        """Todas las órdenes"""
+    async def _select_at_risk(
+        self,
+        columns: Tuple[str, ...],
+        within_hours: float,
+        platform: Optional[str],
+        shipping_type: Optional[str]
+    ) -> List[Dict]:
+        now = datetime.now(timezone.utc)
+        query = self.db.table('orders').select(','.join(columns)).in_(
+            'current_status', list(OPEN_ORDER_STATUSES)
+        ).gte('limite_despacho', now.isoformat()).lte(
+            'limite_despacho', (now + timedelta(hours=within_hours)).isoformat()
+        )
+        if platform:
+            query = query.eq('platform', platform)
+        if shipping_type:
+            query = query.eq('shipping_type', shipping_type)
+        result = await query.order('limite_despacho').execute()
+        
+        orders = result.data or []
+        for order in orders:
+            deadline = parse_iso_date(order['limite_despacho'])
+            if deadline.tzinfo is None:
+                deadline = deadline.replace(tzinfo=timezone.utc)
+            order['hours_until_deadline'] = round((deadline - now).total_seconds() / 3600, 2)
+        return orders
+    
+    async def get_orders_page(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        platform: Optional[str] = None,
+        status: Optional[str] = None,
+        shipping_type: Optional[str] = None,
+        offset: int = 0,
+        fields: Optional[str] = None
+    ) -> Dict:
+        """
+        Una página de órdenes, de la más nueva a la más vieja, paginada por
+        (created_at, id): cada página filtra desde la última fila de la
+        anterior, así cuesta lo mismo en cualquier profundidad y los inserts
+        del sync no corren filas entre páginas. cursor es el next_cursor de
+        la página anterior (ValueError si está mal formado). offset queda
+        por compatibilidad y solo se usa sin cursor.
+        """
+        columns = resolve_fields('orders', fields)
+        after = decode_cursor(cursor) if cursor else None
         try:
-            result = self.db.table('orders').select('*').order(
-                'created_at', desc=True
-            ).range(offset, offset + limit - 1).execute()
-            return result.data or []
+            query = self.db.table('orders').select(','.join(columns))
+            if platform:
+                query = query.eq('platform', platform)
+            if status:
+                query = query.eq('current_status', status)
+            if shipping_type:
+                query = query.eq('shipping_type', shipping_type)
+            if after:
+                query = query.or_(keyset_filter(*after))
+            query = query.order('created_at', desc=True).order('id', desc=True)
+            
+            # Se pide una fila de más para saber si hay otra página
+            if after or not offset:
+                query = query.limit(limit + 1)
+            else:
+                query = query.range(offset, offset + limit)
+            rows = (await query.execute()).data or []
+            
+            next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+            return {'items': rows[:limit], 'next_cursor': next_cursor}
         except Exception as e:
             logger.error(f"Error: {e}")
-            return []
+            return {'items': [], 'next_cursor': None}
     
-    def get_orders_to_ship(self) -> List[Dict]:
+    async def get_orders_to_ship(self, fields: Optional[str] = None) -> List[Dict]:
         """Órdenes por enviar (todas las pendientes)"""
-        try:
-            result = self.db.table('orders_to_ship').select('*').execute()
-            return result.data or []
-        except Exception as e:
-            logger.error(f"Error: {e}")
-            return []
-        
-    def get_delivered_orders(self) -> List[Dict]:
+        return await self._view_list('orders_to_ship', fields)
+    
+    async def get_delivered_orders(self, fields: Optional[str] = None) -> List[Dict]:
         """Órdenes entregadas"""
+        columns = resolve_fields('orders_delivered', fields)
         try:
-            result = self.db.table('orders').select('*').eq(
-                'current_status', 'entregado'
-            ).order('updated_at', desc=True).limit(100).execute()
-            return result.data or []
+            return await self._cached_list(('orders_delivered', columns), lambda: self._select_delivered(columns))
         except Exception as e:
             logger.error(f"Error: {e}")
-            return []
\ No newline at end of file
+            return []
+    
+    async def _select_delivered(self, columns: Tuple[str, ...]) -> List[Dict]:
+        result = await self.db.table('orders').select(','.join(columns)).eq(
+            'current_status', 'entregado'
+        ).order('updated_at', desc=True).limit(100).execute()
+        return result.data or []
@@ -0,0 +1,79 @@
+# =====================================================
+# backend/app/services/sync_cursor_service.py
+# =====================================================
+# Tabla requerida en Supabase:
+#
+#   create table sync_cursors (
+#       platform text not null,
+#       scope text not null,
+#       cursor text not null,
+#       updated_at timestamptz not null default now(),
+#       primary key (platform, scope)
+#   );
+from typing import List, Dict, Optional
+from datetime import datetime
+from supabase import Client
+from app.models.enums import Platform
+from app.utils.date_helpers import parse_iso_date
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SyncCursorService:
+    """Guarda el último updated_at sincronizado por plataforma y alcance (pending/full)"""
+    
+    def __init__(self, db: Client):
+        self.db = db
+    
+    def get_cursor(self, platform: Platform, scope: str) -> Optional[datetime]:
+        """Obtiene el cursor de una plataforma, None si nunca se sincronizó"""
+        try:
+            result = self.db.table('sync_cursors').select('cursor').eq(
+                'platform', platform.value
+            ).eq('scope', scope).execute()
+            if result.data:
+                return parse_iso_date(result.data[0]['cursor'])
+            return None
+        except Exception as e:
+            logger.error(f"Error fetching sync cursor for {platform.value}/{scope}: {e}")
+            return None
+    
+    def set_cursor(self, platform: Platform, scope: str, cursor: datetime) -> bool:
+        """Avanza el cursor de una plataforma"""
+        try:
+            self.db.table('sync_cursors').upsert(
+                {
+                    'platform': platform.value,
+                    'scope': scope,
+                    'cursor': cursor.isoformat(),
+                    'updated_at': datetime.now().isoformat()
+                },
+                on_conflict='platform,scope'
+            ).execute()
+            logger.info(f"Sync cursor for {platform.value}/{scope} moved to {cursor.isoformat()}")
+            return True
+        except Exception as e:
+            logger.error(f"Error saving sync cursor for {platform.value}/{scope}: {e}")
+            return False
+    
+    def reset_cursor(self, platform: Platform, scope: Optional[str] = None) -> bool:
+        """Borra el cursor para forzar una resincronización completa"""
+        try:
+            query = self.db.table('sync_cursors').delete().eq('platform', platform.value)
+            if scope:
+                query = query.eq('scope', scope)
+            query.execute()
+            logger.info(f"Sync cursor for {platform.value} reset")
+            return True
+        except Exception as e:
+            logger.error(f"Error resetting sync cursor for {platform.value}: {e}")
+            return False
+    
+    def get_all_cursors(self) -> List[Dict]:
+        """Lista todos los cursores"""
+        try:
+            result = self.db.table('sync_cursors').select('*').order('platform').execute()
+            return result.data or []
+        except Exception as e:
+            logger.error(f"Error: {e}")
+            return []
@@ -0,0 +1,149 @@
+from typing import Dict, List, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from uuid import UUID
+from app.core.database import get_db
+from app.config import get_settings
+from app.models.sync_job import SyncJob, PlatformSyncProgress
+from app.models.enums import Platform, SyncJobStatus
+from app.services.sync_service import SyncService
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+SYNC_JOB_KINDS = ('all',) + tuple(platform.value for platform in Platform)
+
+class SyncJobRunner:
+    """
+    Ejecuta los syncs fuera del request, en un pool de workers propio.
+    
+    Cada job tiene un ID para consultar su avance por plataforma; se guardan
+    los últimos history_size jobs en memoria.
+    """
+    
+    def __init__(self, max_workers: int = 2, history_size: int = 50):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sync-job')
+        self.history_size = history_size
+        self.jobs: "OrderedDict[UUID, SyncJob]" = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def _store(self, job: SyncJob) -> None:
+        with self.lock:
+            self.jobs[job.id] = job
+            while len(self.jobs) > self.history_size:
+                oldest = next(iter(self.jobs.values()))
+                if oldest.status in (SyncJobStatus.QUEUED, SyncJobStatus.RUNNING):
+                    break
+                self.jobs.popitem(last=False)
+    
+    def _record(
+        self,
+        job: SyncJob,
+        platform: str,
+        status: Optional[str] = None,
+        pages_fetched: int = 0,
+        orders_fetched: int = 0,
+        orders_upserted: int = 0,
+        orders_queued: int = 0,
+        errors: Optional[List[str]] = None
+    ) -> None:
+        """Callback de progreso que recibe SyncService"""
+        with self.lock:
+            progress = job.progress.setdefault(platform, PlatformSyncProgress())
+            if status:
+                progress.status = status
+            progress.pages_fetched += pages_fetched
+            progress.orders_fetched += orders_fetched
+            progress.orders_upserted += orders_upserted
+            progress.orders_queued += orders_queued
+            if errors:
+                progress.errors.extend(errors)
+    
+    def _run(self, job: SyncJob) -> None:
+        with self.lock:
+            job.status = SyncJobStatus.RUNNING
+            job.started_at = datetime.now()
+        
+        try:
+            sync_service = SyncService(
+                get_db(),
+                progress=lambda platform, **updates: self._record(job, platform, **updates)
+            )
+            if job.kind == 'all':
+                result = sync_service.sync_all_platforms(**job.params)
+            else:
+                result = sync_service.sync_platform(Platform(job.kind), **job.params)
+            
+            with self.lock:
+                job.result = result
+                job.status = SyncJobStatus.COMPLETED
+        except Exception as e:
+            logger.error(f"Sync job {job.id} failed: {e}")
+            with self.lock:
+                job.error = str(e)
+                job.status = SyncJobStatus.FAILED
+                if job.kind in job.progress:
+                    job.progress[job.kind].status = 'failed'
+        finally:
+            with self.lock:
+                job.finished_at = datetime.now()
+            logger.info(f"Sync job {job.id} ({job.kind}) finished with status {job.status.value}")
+    
+    def submit(self, kind: str, trigger: str = 'api', **params) -> SyncJob:
+        """Encola un sync y retorna el job sin esperar a que termine"""
+        if kind not in SYNC_JOB_KINDS:
+            raise ValueError(f"Unknown sync job kind: {kind}")
+        
+        job = SyncJob(kind=kind, trigger=trigger, params=params)
+        self._store(job)
+        self.executor.submit(self._run, job)
+        logger.info(f"Sync job {job.id} ({kind}) queued by {trigger}")
+        return job
+    
+    def run(self, kind: str, trigger: str = 'api', **params) -> SyncJob:
+        """Ejecuta un sync en el thread actual, registrándolo en el historial"""
+        if kind not in SYNC_JOB_KINDS:
+            raise ValueError(f"Unknown sync job kind: {kind}")
+        
+        job = SyncJob(kind=kind, trigger=trigger, params=params)
+        self._store(job)
+        self._run(job)
+        return job
+    
+    def get_job(self, job_id: UUID) -> Optional[Dict]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return job.model_dump(mode='json') if job else None
+    
+    def get_recent_jobs(self, limit: int = 20) -> List[Dict]:
+        with self.lock:
+            recent = list(self.jobs.values())[-limit:]
+            return [job.model_dump(mode='json') for job in reversed(recent)]
+    
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+_runner: Optional[SyncJobRunner] = None
+_runner_lock = threading.Lock()
+
+def get_sync_job_runner() -> SyncJobRunner:
+    """Runner compartido del proceso"""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                settings = get_settings()
+                _runner = SyncJobRunner(
+                    max_workers=settings.SYNC_JOB_WORKERS,
+                    history_size=settings.SYNC_JOB_HISTORY_SIZE
+                )
+    return _runner
+
+def shutdown_sync_job_runner() -> None:
+    global _runner
+    with _runner_lock:
+        if _runner is not None:
+            _runner.shutdown()
+            _runner = None
@@ -0,0 +1,85 @@
+from typing import Callable, Generic, Iterable, Iterator, Optional, TypeVar
+import queue
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+_DONE = object()
+
+class BufferedStage(Generic[T]):
+    """
+    Etapa de un pipeline: consume un iterable en su propio thread y entrega
+    sus items por una cola acotada.
+    
+    Cuando la cola se llena el productor se bloquea, así la etapa anterior
+    nunca adelanta más de maxsize items a la siguiente y la memoria queda
+    acotada sin importar el tamaño total. Un error en el productor se
+    propaga al consumidor; close() detiene al productor si el consumidor
+    termina antes, y el productor cierra su fuente al salir.
+    """
+    
+    def __init__(self, source: Iterable[T], maxsize: int = 4, name: str = 'stage'):
+        self.queue: "queue.Queue" = queue.Queue(maxsize=max(1, maxsize))
+        self.stop_event = threading.Event()
+        self.error: Optional[BaseException] = None
+        self.thread = threading.Thread(
+            target=self._produce, args=(source,), name=f"sync-{name}", daemon=True
+        )
+        self.thread.start()
+    
+    def _put(self, item) -> bool:
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _produce(self, source: Iterable[T]) -> None:
+        try:
+            for item in source:
+                if not self._put(item):
+                    return
+        except BaseException as e:
+            self.error = e
+        finally:
+            # Un generador cortado a medias (páginas HTTP) se cierra acá, en su
+            # propio thread; desde close() fallaría si está en plena descarga
+            if hasattr(source, 'close'):
+                try:
+                    source.close()
+                except Exception as e:
+                    logger.warning(f"Error closing pipeline source: {e}")
+            self._put(_DONE)
+    
+    def __iter__(self) -> Iterator[T]:
+        while True:
+            try:
+                item = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                # Cerrada desde afuera: el productor ya no va a entregar _DONE
+                if self.stop_event.is_set():
+                    return
+                continue
+            if item is _DONE:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield item
+    
+    def close(self) -> None:
+        self.stop_event.set()
+    
+    def __enter__(self) -> "BufferedStage[T]":
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def map_stage(source: Iterable, fn: Callable, maxsize: int = 4, name: str = 'map') -> BufferedStage:
+    """Aplica fn a cada item de source en un thread aparte"""
+    return BufferedStage((fn(item) for item in source), maxsize=maxsize, name=name)
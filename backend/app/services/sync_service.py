@@ -1,61 +1,256 @@
-from typing import Dict
+from typing import Callable, Dict, List, Optional
 from datetime import datetime, timedelta
 from supabase import Client
+from app.integrations.base import BasePlatformIntegration
 from app.integrations.falabella import FalabellaIntegration
 from app.integrations.mercadolibre import MercadoLibreIntegration
 from app.services.order_service import OrderService
-from app.models.order import OrderCreate
+from app.services.sync_cursor_service import SyncCursorService
+from app.services.sync_pipeline import BufferedStage, map_stage
+from app.services.order_outbox import get_order_outbox
+from app.models.enums import Platform
 from app.config import get_settings
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+class SyncAlreadyRunningError(Exception):
+    """Ya hay un sync en curso para la plataforma"""
+    pass
+
+# Un sync a la vez por plataforma en todo el proceso (API, jobs y scheduler)
+_platform_locks = {platform: threading.Lock() for platform in Platform}
+
 class SyncService:
-    def __init__(self, db: Client):
+    def __init__(self, db: Client, progress: Optional[Callable[..., None]] = None):
         self.db = db
+        # progress(platform, status=..., pages_fetched=..., orders_fetched=...,
+        #          orders_upserted=..., orders_queued=..., errors=[...]) recibe el
+        #          avance de cada plataforma
+        self.progress = progress
         self.order_service = OrderService(db)
+        # Con outbox las filas se encolan localmente y el flusher las escribe;
+        # encolar no cuenta como guardar: el sync espera el resultado del
+        # flusher antes de mover el cursor (_await_outbox)
+        self.outbox = get_order_outbox()
+        self.cursor_service = SyncCursorService(db)
         self.settings = get_settings()
         
-        self.falabella = FalabellaIntegration(
+        self.integrations: Dict[Platform, BasePlatformIntegration] = {}
+        
+        self.falabella = self.register_integration(FalabellaIntegration(
             api_key=self.settings.FALABELLA_API_KEY,
             user_id=self.settings.FALABELLA_USER_ID,
-            base_url=self.settings.FALABELLA_BASE_URL
-        )
+            base_url=self.settings.FALABELLA_BASE_URL,
+            rate_limit_per_second=self.settings.FALABELLA_RATE_LIMIT_PER_SECOND,
+            rate_limit_burst=self.settings.FALABELLA_RATE_LIMIT_BURST,
+            page_size=self.settings.FALABELLA_PAGE_SIZE,
+            max_workers=self.settings.FALABELLA_MAX_WORKERS,
+            fetch_order_items=self.settings.FALABELLA_FETCH_ORDER_ITEMS,
+            order_items_chunk_size=self.settings.FALABELLA_ORDER_ITEMS_CHUNK_SIZE
+        ))
         
-        self.mercadolibre = MercadoLibreIntegration(
+        self.mercadolibre = self.register_integration(MercadoLibreIntegration(
             access_token=self.settings.MELI_ACCESS_TOKEN,
             user_id=self.settings.MELI_USER_ID,
-            base_url=self.settings.MELI_BASE_URL
+            base_url=self.settings.MELI_BASE_URL,
+            max_workers=self.settings.MELI_SHIPMENT_WORKERS,
+            rate_limit_per_second=self.settings.MELI_RATE_LIMIT_PER_SECOND,
+            rate_limit_burst=self.settings.MELI_RATE_LIMIT_BURST,
+            shipment_cache_ttl_seconds=self.settings.MELI_SHIPMENT_CACHE_TTL_SECONDS,
+            shipment_cache_max_entries=self.settings.MELI_SHIPMENT_CACHE_MAX_ENTRIES,
+            shipment_cache_terminal_max_entries=self.settings.MELI_SHIPMENT_CACHE_TERMINAL_MAX_ENTRIES
+        ))
+    
+    def register_integration(self, integration: BasePlatformIntegration) -> BasePlatformIntegration:
+        """Agrega una plataforma a los syncs de este servicio"""
+        integration.on_page = self._page_reporter(integration.platform)
+        self.integrations[integration.platform] = integration
+        return integration
+    
+    @contextmanager
+    def _platform_lock(self, platform: Platform):
+        lock = _platform_locks[platform]
+        if not lock.acquire(blocking=False):
+            raise SyncAlreadyRunningError(f"A {platform.value} sync is already running")
+        try:
+            yield
+        finally:
+            lock.release()
+    
+    def _report(self, platform: Platform, **updates) -> None:
+        if self.progress:
+            self.progress(platform.value, **updates)
+    
+    def _page_reporter(self, platform: Platform) -> Callable[[int], None]:
+        def on_page(count: int) -> None:
+            self._report(platform, pages_fetched=1, orders_fetched=count)
+        return on_page
+    
+    def _finish_report(self, platform: Platform, result: Dict, write_result: Dict) -> None:
+        self._report(
+            platform,
+            status='completed',
+            errors=result['fetch_errors'] + write_result['errors']
+        )
+    
+    def _validate_page(self, integration: BasePlatformIntegration, page: List[Dict]) -> Dict:
+        """
+        Etapa de mapeo y validación: convierte una página cruda en filas listas
+        para Supabase, validando toda la página en una sola llamada.
+        
+        Retorna las filas, cuántas órdenes fallaron y el mayor updated_at de
+        la página, para no tener que retener las órdenes hasta el final.
+        """
+        platform = integration.platform
+        mapped = []
+        errors = []
+        max_updated = None
+        for raw_order in page:
+            try:
+                order_data = integration.map_to_standard_order(raw_order)
+            except Exception as e:
+                errors.append(f"mapping: {e}")
+                continue
+            mapped.append(order_data)
+            updated = order_data.get('source_updated_at')
+            if updated and (max_updated is None or updated > max_updated):
+                max_updated = updated
+        
+        rows, validation_errors = self.order_service.prepare_order_rows(mapped)
+        errors.extend(validation_errors)
+        for error in errors:
+            logger.error(f"Error syncing {platform.value} order: {error}")
+        
+        return {
+            'rows': rows,
+            'fetched': len(page),
+            'invalid': len(errors),
+            'errors': errors,
+            'max_updated': max_updated
+        }
+    
+    def _flush_orders(self, platform: Platform, rows: List[Dict], totals: Dict) -> None:
+        """
+        Etapa de escritura: encola el lote en el outbox o, si no hay outbox, su
+        flusher no está corriendo (p.ej. el backfill por CLI) o falla, hace el
+        upsert directo; acumula los contadores en totals.
+        """
+        if self.outbox is not None and self.outbox.running:
+            try:
+                totals['receipts'].append(self.outbox.enqueue(rows))
+                totals['queued'] += len(rows)
+                self._report(platform, orders_queued=len(rows))
+                return
+            except Exception as e:
+                logger.error(f"Error queueing {len(rows)} {platform.value} orders in outbox, writing directly: {e}")
+        
+        write_result = self.order_service.bulk_upsert_rows(
+            rows,
+            chunk_size=self.settings.ORDER_UPSERT_CHUNK_SIZE
         )
+        for key in ('succeeded', 'failed', 'skipped'):
+            totals[key] += write_result[key]
+        totals['errors'].extend(write_result['errors'])
+        self._report(platform, orders_upserted=write_result['succeeded'])
+    
+    def ingest_orders(self, platform: Platform, raw_orders: List[Dict]) -> Dict:
+        """
+        Mapea, valida y guarda órdenes crudas que llegan fuera de un sync
+        (por ejemplo desde notificaciones), sin tocar el cursor.
+        """
+        validated = self._validate_page(self.integrations[platform], raw_orders)
+        totals = {
+            'succeeded': 0,
+            'failed': validated['invalid'],
+            'skipped': 0,
+            'queued': 0,
+            'errors': list(validated['errors']),
+            'receipts': []
+        }
+        if validated['rows']:
+            self._flush_orders(platform, validated['rows'], totals)
+        return totals
+    
+    def _cursor_scope(self, only_pending: bool) -> str:
+        """Los syncs pending y full avanzan cursores distintos"""
+        return 'pending' if only_pending else 'full'
+    
+    def _get_updated_after(self, platform: Platform, scope: str, full_resync: bool) -> Optional[datetime]:
+        """Cursor guardado menos un margen de solapamiento, None si hay que partir de cero"""
+        if full_resync:
+            return None
+        cursor = self.cursor_service.get_cursor(platform, scope)
+        if cursor is None:
+            return None
+        return cursor - timedelta(minutes=self.settings.SYNC_CURSOR_OVERLAP_MINUTES)
+    
+    def _advance_cursor(
+        self,
+        integration: BasePlatformIntegration,
+        scope: str,
+        new_cursor: Optional[datetime],
+        write_result: Dict
+    ) -> Optional[str]:
+        """
+        Avanza el cursor al mayor updated_at visto, solo si la descarga quedó
+        completa y todas las órdenes se guardaron en Supabase (no alcanza con
+        que estén en el outbox).
+        """
+        platform = integration.platform
+        if integration.fetch_errors or write_result['failed'] or write_result['queued']:
+            logger.warning(
+                f"Sync cursor for {platform.value}/{scope} not advanced: "
+                f"{len(integration.fetch_errors)} fetch errors, {write_result['failed']} failed writes, "
+                f"{write_result['queued']} still in outbox"
+            )
+            return None
+        
+        if new_cursor is None:
+            return None
+        
+        if not self.cursor_service.set_cursor(platform, scope, new_cursor):
+            return None
+        return new_cursor.isoformat()
     
-    def sync_all_platforms(self, only_pending: bool = True) -> Dict:
-        """Sincroniza todas las plataformas"""
+    def sync_all_platforms(self, only_pending: bool = True, full_resync: bool = False) -> Dict:
+        """
+        Sincroniza todas las plataformas registradas en paralelo.
+        
+        Cada plataforma corre en su propio thread y un error en una no afecta
+        a las demás; el tiempo total es el de la plataforma más lenta.
+        """
         start_time = datetime.now()
-        results = {
-            'falabella': None,
-            'mercadolibre': None,
+        results = {platform.value: None for platform in self.integrations}
+        results.update({
             'total_synced': 0,
             'errors': [],
             'sync_type': 'pending_only' if only_pending else 'full'
-        }
+        })
         
-        # Falabella
-        try:
-            fb_result = self.sync_falabella(only_pending=only_pending)
-            results['falabella'] = fb_result
-            results['total_synced'] += fb_result.get('orders_synced', 0)
-        except Exception as e:
-            logger.error(f"Error syncing Falabella: {e}")
-            results['errors'].append(f"Falabella: {str(e)}")
-        
-        # MercadoLibre
-        try:
-            ml_result = self.sync_mercadolibre(only_pending=only_pending)
-            results['mercadolibre'] = ml_result
-            results['total_synced'] += ml_result.get('orders_synced', 0)
-        except Exception as e:
-            logger.error(f"Error syncing MercadoLibre: {e}")
-            results['errors'].append(f"MercadoLibre: {str(e)}")
+        with ThreadPoolExecutor(max_workers=len(self.integrations), thread_name_prefix='sync-platform') as executor:
+            futures = {
+                executor.submit(self.sync_platform, platform, only_pending, full_resync): platform
+                for platform in self.integrations
+            }
+            for future in as_completed(futures):
+                platform = futures[future]
+                try:
+                    platform_result = future.result()
+                    results[platform.value] = platform_result
+                    results['total_synced'] += platform_result.get('orders_synced', 0)
+                    if platform_result['fetch_errors']:
+                        results['errors'].append(
+                            f"{platform.value}: {len(platform_result['fetch_errors'])} requests failed, sync incomplete"
+                        )
+                except Exception as e:
+                    logger.error(f"Error syncing {platform.value}: {e}")
+                    results['errors'].append(f"{platform.value}: {str(e)}")
+                    self._report(platform, status='failed', errors=[str(e)])
         
         execution_time = (datetime.now() - start_time).total_seconds() * 1000
         results['execution_time_ms'] = execution_time
@@ -63,50 +258,155 @@ class SyncService:
         logger.info(f"Sync completed: {results['total_synced']} orders in {execution_time}ms (type: {results['sync_type']})")
         return results
     
-    def sync_falabella(self, only_pending: bool = True) -> Dict:
-        """Sincroniza Falabella"""
-        created_after = (datetime.now() - timedelta(days=7)).isoformat()
-        orders = self.falabella.get_orders_standardized(
-            only_pending=only_pending,
-            created_after=created_after, 
-            limit=100
-        )
+    def sync_platform(self, platform: Platform, only_pending: bool = True, full_resync: bool = False) -> Dict:
+        """Sincroniza una plataforma (incremental desde el último cursor)"""
+        with self._platform_lock(platform):
+            return self._sync_platform(self.integrations[platform], only_pending, full_resync)
+    
+    def _run_pipeline(self, integration: BasePlatformIntegration, window: Dict, only_pending: bool) -> Dict:
+        """
+        Pipeline fetch → map/validate → upsert con colas acotadas entre etapas.
         
-        synced = 0
-        for order_data in orders:
-            try:
-                order_create = OrderCreate(**order_data)
-                self.order_service.create_or_update_order(order_create)
-                synced += 1
-            except Exception as e:
-                logger.error(f"Error syncing Falabella order: {e}")
+        Los upserts empiezan apenas se junta un lote, mientras las páginas
+        siguientes todavía se descargan; en memoria solo hay unas pocas páginas
+        y un lote pendiente, sin importar el tamaño de la ventana.
         
-        return {
-            'platform': 'falabella',
-            'orders_synced': synced,
-            'orders_fetched': len(orders),
+        Retorna los contadores de escritura (totals), las órdenes descargadas
+        y el mayor updated_at visto.
+        """
+        platform = integration.platform
+        queue_pages = self.settings.SYNC_PIPELINE_QUEUE_PAGES
+        batch_size = self.settings.ORDER_UPSERT_CHUNK_SIZE
+        totals = {'succeeded': 0, 'failed': 0, 'invalid': 0, 'skipped': 0, 'queued': 0, 'errors': [], 'receipts': []}
+        fetched = 0
+        max_updated = None
+        batch: List[Dict] = []
+        
+        with BufferedStage(
+            integration.iter_fetched_pages(only_pending=only_pending, **window),
+            maxsize=queue_pages,
+            name=f"{platform.value}-fetch"
+        ) as raw_pages, map_stage(
+            raw_pages,
+            lambda page: self._validate_page(integration, page),
+            maxsize=queue_pages,
+            name=f"{platform.value}-validate"
+        ) as validated_pages:
+            for validated in validated_pages:
+                fetched += validated['fetched']
+                totals['failed'] += validated['invalid']
+                totals['invalid'] += validated['invalid']
+                totals['errors'].extend(validated['errors'])
+                if validated['max_updated'] and (max_updated is None or validated['max_updated'] > max_updated):
+                    max_updated = validated['max_updated']
+                
+                batch.extend(validated['rows'])
+                if len(batch) >= batch_size:
+                    self._flush_orders(platform, batch, totals)
+                    batch = []
+            
+            if batch:
+                self._flush_orders(platform, batch, totals)
+        
+        self._await_outbox(platform, totals)
+        return {'totals': totals, 'fetched': fetched, 'max_updated': max_updated}
+    
+    def _await_outbox(self, platform: Platform, totals: Dict) -> None:
+        """
+        Espera a que el flusher escriba las filas que encoló este sync y suma
+        sus resultados (changed, skipped, dead como failed) a totals. queued
+        queda con las que siguen en el outbox al vencer el plazo: el cursor
+        no avanza mientras haya alguna, y el próximo sync las vuelve a pedir.
+        """
+        receipts = totals['receipts']
+        if not receipts:
+            return
+        deadline = time.monotonic() + self.settings.ORDER_OUTBOX_SYNC_WAIT_SECONDS
+        for receipt in receipts:
+            if not receipt.wait(max(0.0, deadline - time.monotonic())):
+                break
+        
+        totals['queued'] = 0
+        for receipt in receipts:
+            summary = receipt.summary()
+            totals['succeeded'] += summary['succeeded']
+            totals['skipped'] += summary['skipped']
+            totals['failed'] += summary['failed']
+            totals['queued'] += summary['pending']
+            totals['errors'].extend(summary['errors'])
+        totals['receipts'] = []
+        if totals['queued']:
+            logger.warning(
+                f"{totals['queued']} {platform.value} orders still in outbox after "
+                f"{self.settings.ORDER_OUTBOX_SYNC_WAIT_SECONDS:.0f}s"
+            )
+    
+    def _build_result(self, integration: BasePlatformIntegration, run: Dict, only_pending: bool) -> Dict:
+        totals = run['totals']
+        result = {
+            'platform': integration.platform.value,
+            'orders_synced': totals['succeeded'] + totals['skipped'] + totals['queued'],
+            'orders_failed': totals['failed'],
+            # Rechazadas al mapear o validar; el resto de orders_failed son escrituras
+            'orders_invalid': totals['invalid'],
+            'orders_fetched': run['fetched'],
+            'orders_changed': totals['succeeded'],
+            'orders_skipped': totals['skipped'],
+            'orders_queued': totals['queued'],
+            'fetch_errors': integration.fetch_errors,
+            'throttle': integration.throttle_state(),
             'only_pending': only_pending
         }
+        result.update(integration.fetch_report())
+        return result
     
-    def sync_mercadolibre(self, only_pending: bool = True) -> Dict:
-        """Sincroniza MercadoLibre"""
-        orders = self.mercadolibre.get_orders_standardized(
-            only_pending=only_pending, 
-            limit=50
-        )
+    def _sync_platform(self, integration: BasePlatformIntegration, only_pending: bool, full_resync: bool) -> Dict:
+        """Sync incremental de una plataforma desde su cursor"""
+        platform = integration.platform
+        start_time = datetime.now()
+        self._report(platform, status='running')
+        scope = self._cursor_scope(only_pending)
+        updated_after = self._get_updated_after(platform, scope, full_resync)
+        window = integration.sync_window(updated_after, self.settings.SYNC_INITIAL_WINDOW_DAYS)
         
-        synced = 0
-        for order_data in orders:
-            try:
-                order_create = OrderCreate(**order_data)
-                self.order_service.create_or_update_order(order_create)
-                synced += 1
-            except Exception as e:
-                logger.error(f"Error syncing ML order: {e}")
+        run = self._run_pipeline(integration, window, only_pending)
+        logger.info(f"Fetched {run['fetched']} orders from {platform.value}")
         
-        return {
-            'platform': 'mercadolibre',
-            'orders_synced': synced,
-            'orders_fetched': len(orders),
-            'only_pending': only_pending
-        }
\ No newline at end of file
+        result = self._build_result(integration, run, only_pending)
+        result['sync_mode'] = 'incremental' if updated_after else 'initial'
+        result['cursor'] = self._advance_cursor(integration, scope, run['max_updated'], run['totals'])
+        result['execution_time_ms'] = (datetime.now() - start_time).total_seconds() * 1000
+        self._finish_report(platform, result, run['totals'])
+        return result
+    
+    def sync_range(
+        self,
+        platform: Platform,
+        start: datetime,
+        end: datetime,
+        only_pending: bool = False
+    ) -> Dict:
+        """
+        Sincroniza las órdenes creadas entre start y end, sin usar ni mover el
+        cursor. Es la unidad de trabajo del backfill; no toma el lock de la
+        plataforma para no frenar los syncs programados durante horas.
+        """
+        integration = self.integrations[platform]
+        start_time = datetime.now()
+        self._report(platform, status='running')
+        
+        run = self._run_pipeline(integration, integration.backfill_window(start, end), only_pending)
+        
+        result = self._build_result(integration, run, only_pending)
+        result['sync_mode'] = 'backfill'
+        result['execution_time_ms'] = (datetime.now() - start_time).total_seconds() * 1000
+        self._finish_report(platform, result, run['totals'])
+        return result
+    
+    def sync_falabella(self, only_pending: bool = True, full_resync: bool = False) -> Dict:
+        """Sincroniza Falabella"""
+        return self.sync_platform(Platform.FALABELLA, only_pending=only_pending, full_resync=full_resync)
+    
+    def sync_mercadolibre(self, only_pending: bool = True, full_resync: bool = False) -> Dict:
+        """Sincroniza MercadoLibre"""
+        return self.sync_platform(Platform.MERCADOLIBRE, only_pending=only_pending, full_resync=full_resync)
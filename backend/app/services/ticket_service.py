@@ -1,18 +1,22 @@
 from typing import List, Optional
 from uuid import UUID
 from datetime import datetime
-from supabase import Client
+from supabase import AsyncClient
 from app.models.ticket import Ticket, TicketCreate, TicketUpdate
 from app.models.enums import TicketStatus
 import logging
 
 logger = logging.getLogger(__name__)
 
-class TicketService:
-    def __init__(self, db: Client):
+OPEN_TICKET_STATUSES = [TicketStatus.OPEN.value, TicketStatus.IN_PROGRESS.value]
+
+class AsyncTicketService:
+    """Tickets de órdenes, con el cliente async de Supabase para los endpoints"""
+    
+    def __init__(self, db: AsyncClient):
         self.db = db
     
-    def create_ticket(self, ticket_data: TicketCreate) -> Optional[Ticket]:
+    async def create_ticket(self, ticket_data: TicketCreate) -> Optional[Ticket]:
         """Crea un ticket (REACTIVO)"""
         try:
             data = ticket_data.model_dump()
@@ -20,7 +24,7 @@ class TicketService:
             data['priority'] = data['priority'].value
             data['status'] = TicketStatus.OPEN.value
             
-            result = self.db.table('tickets').insert(data).execute()
+            result = await self.db.table('tickets').insert(data).execute()
             
             if result.data:
                 logger.info(f"Ticket created for order {ticket_data.order_id}")
@@ -30,7 +34,7 @@ class TicketService:
             logger.error(f"Error creating ticket: {e}")
             return None
     
-    def update_ticket(self, ticket_id: UUID, update_data: TicketUpdate) -> Optional[Ticket]:
+    async def update_ticket(self, ticket_id: UUID, update_data: TicketUpdate) -> Optional[Ticket]:
         """Actualiza un ticket"""
         try:
             data = update_data.model_dump(exclude_none=True)
@@ -43,7 +47,7 @@ class TicketService:
             if 'priority' in data:
                 data['priority'] = data['priority'].value
             
-            result = self.db.table('tickets').update(data).eq(
+            result = await self.db.table('tickets').update(data).eq(
                 'id', str(ticket_id)
             ).execute()
             
@@ -54,10 +58,10 @@ class TicketService:
             logger.error(f"Error updating ticket: {e}")
             return None
     
-    def get_tickets_by_order(self, order_id: UUID) -> List[Ticket]:
+    async def get_tickets_by_order(self, order_id: UUID) -> List[Ticket]:
         """Tickets de una orden"""
         try:
-            result = self.db.table('tickets').select('*').eq(
+            result = await self.db.table('tickets').select('*').eq(
                 'order_id', str(order_id)
             ).order('created_at', desc=True).execute()
             
@@ -66,11 +70,11 @@ class TicketService:
             logger.error(f"Error: {e}")
             return []
     
-    def get_open_tickets(self) -> List[Ticket]:
+    async def get_open_tickets(self) -> List[Ticket]:
         """Todos los tickets abiertos"""
         try:
-            result = self.db.table('tickets').select('*').in_(
-                'status', [TicketStatus.OPEN.value, TicketStatus.IN_PROGRESS.value]
+            result = await self.db.table('tickets').select('*').in_(
+                'status', OPEN_TICKET_STATUSES
             ).order('priority', desc=True).execute()
             
             return [Ticket(**t) for t in result.data] if result.data else []
@@ -0,0 +1,18 @@
+import hashlib
+from typing import Dict
+from pydantic_core import to_json
+
+# Campos que cambian en cada sync aunque la orden no haya cambiado
+VOLATILE_ORDER_FIELDS = {'content_hash', 'delay_detected_at'}
+
+def order_fingerprint(row: Dict) -> str:
+    """
+    Hash de una fila de orden normalizada.
+    
+    Las filas se arman siempre en el mismo orden de campos, así que se
+    serializa sin ordenar claves (to_json es ~3x más rápido que json.dumps
+    con sort_keys). Si una plataforma reordena las claves de raw_data el
+    resultado es solo una escritura de más, nunca un cambio perdido.
+    """
+    normalized = {k: v for k, v in row.items() if k not in VOLATILE_ORDER_FIELDS}
+    return hashlib.sha256(to_json(normalized)).hexdigest()
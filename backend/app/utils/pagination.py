@@ -0,0 +1,31 @@
+from typing import Dict, Tuple
+from uuid import UUID
+from app.utils.date_helpers import parse_iso_date
+import base64
+import json
+
+def encode_cursor(row: Dict) -> str:
+    """Cursor opaco con el (created_at, id) de la última fila de una página"""
+    payload = json.dumps([row['created_at'], str(row['id'])], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """(created_at, id) de un cursor; ValueError si está mal formado"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, order_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if parse_iso_date(created_at) is None:
+            raise ValueError(created_at)
+        return created_at, str(UUID(order_id))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def keyset_filter(created_at: str, order_id: str) -> str:
+    """
+    Filtro PostgREST para las filas que siguen a (created_at, id) en orden
+    descendente. Los valores van entre comillas porque llevan ':' y '+'.
+    """
+    return (
+        f'created_at.lt."{created_at}",'
+        f'and(created_at.eq."{created_at}",id.lt.{order_id})'
+    )
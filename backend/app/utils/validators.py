@@ -0,0 +1,37 @@
+from typing import Dict, List, Tuple
+from pydantic import TypeAdapter, ValidationError
+from app.models.order import OrderCreate
+
+ORDER_CREATE_LIST = TypeAdapter(List[OrderCreate])
+
+def validate_orders_batch(orders_data: List[Dict]) -> Tuple[List[OrderCreate], List[Tuple[int, str]]]:
+    """
+    Valida una página de órdenes mapeadas en una sola llamada.
+    
+    Si alguna falla, se descartan los índices que reporta el ValidationError
+    y se revalida el resto, así una orden mala no invalida la página.
+    Retorna (órdenes válidas, [(índice, error)]).
+    """
+    pending = list(enumerate(orders_data))
+    errors: List[Tuple[int, str]] = []
+    
+    while pending:
+        try:
+            orders = ORDER_CREATE_LIST.validate_python([data for _, data in pending])
+            return orders, errors
+        except ValidationError as e:
+            bad_positions = {}
+            for error in e.errors():
+                position = error['loc'][0] if error['loc'] else None
+                if isinstance(position, int) and position not in bad_positions:
+                    bad_positions[position] = f"{'.'.join(str(p) for p in error['loc'][1:])}: {error['msg']}"
+            if not bad_positions:
+                raise
+            errors.extend((pending[position][0], message) for position, message in bad_positions.items())
+            pending = [item for position, item in enumerate(pending) if position not in bad_positions]
+    
+    return [], errors
+
+def dump_orders_batch(orders: List[OrderCreate]) -> List[Dict]:
+    """Serializa órdenes validadas a dicts JSON (enums como valor, fechas ISO)"""
+    return ORDER_CREATE_LIST.dump_python(orders, mode='json', exclude_none=True)
@@ -0,0 +1,89 @@
+"""
+Backfill histórico de órdenes desde la línea de comandos.
+
+Parte el rango en ventanas, las sincroniza en paralelo por plataforma y
+guarda un checkpoint por ventana; si el proceso se corta, --resume con el
+mismo ID sigue desde la última ventana terminada. Muestra el avance y las
+órdenes por segundo cada --every segundos.
+
+Uso (desde backend/):
+    python -m scripts.backfill --start 2026-01-01 --end 2026-07-01
+    python -m scripts.backfill --start 2026-01-01 --platform falabella --window-hours 12
+    python -m scripts.backfill --resume 6f1c0d52-...
+"""
+import argparse
+import threading
+from datetime import datetime, timezone
+from uuid import UUID
+
+from app.config import get_settings
+from app.models.enums import Platform
+from app.services.backfill_service import BackfillRunner, BackfillService
+from app.core.database import get_db
+
+def parse_date(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def print_progress(progress):
+    if not progress or 'platforms' not in progress:
+        return
+    parts = []
+    for platform, counters in progress['platforms'].items():
+        windows = f"{counters['windows_done']}/{counters['windows_total']}"
+        if counters['windows_failed']:
+            windows += f" ({counters['windows_failed']} failed)"
+        eta = f", eta {counters['eta_seconds']}s" if counters['eta_seconds'] is not None else ""
+        parts.append(
+            f"{platform}: windows {windows}, {counters['orders_fetched']} orders, "
+            f"{counters['orders_per_second']}/s{eta}"
+        )
+    print(f"[{progress['elapsed_seconds']:>7.1f}s] {progress['status']} | " + " | ".join(parts), flush=True)
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--start', type=parse_date, help='Fecha ISO, p.ej. 2026-01-01')
+    parser.add_argument('--end', type=parse_date, default=None, help='Por defecto ahora')
+    parser.add_argument('--platform', action='append', choices=[p.value for p in Platform], help='Repetible; por defecto todas')
+    parser.add_argument('--window-hours', type=int, default=settings.BACKFILL_WINDOW_HOURS)
+    parser.add_argument('--workers', type=int, default=settings.BACKFILL_WINDOW_WORKERS, help='Ventanas en paralelo por plataforma')
+    parser.add_argument('--resume', type=UUID, default=None, help='ID de un backfill a reanudar')
+    parser.add_argument('--every', type=float, default=5.0, help='Segundos entre reportes de avance')
+    args = parser.parse_args()
+    
+    if args.resume:
+        backfill_id = args.resume
+    else:
+        if not args.start:
+            parser.error('--start is required unless --resume is given')
+        platforms = [Platform(p) for p in args.platform] if args.platform else list(Platform)
+        end = args.end or datetime.now(timezone.utc)
+        backfill = BackfillService(get_db()).create_backfill(platforms, args.start, end, args.window_hours)
+        if not backfill:
+            raise SystemExit('Could not create backfill')
+        backfill_id = UUID(str(backfill['id']))
+    print(f"backfill {backfill_id}", flush=True)
+    
+    runner = BackfillRunner(window_workers=args.workers)
+    finished = threading.Event()
+    
+    def report():
+        while not finished.wait(args.every):
+            print_progress(runner.get_progress(backfill_id))
+    
+    reporter = threading.Thread(target=report, daemon=True)
+    reporter.start()
+    try:
+        result = runner.run(backfill_id)
+    except KeyboardInterrupt:
+        raise SystemExit(f"interrupted; resume with --resume {backfill_id}")
+    finally:
+        finished.set()
+    
+    if result is None:
+        raise SystemExit(f"Backfill {backfill_id} not found")
+    print_progress(result)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark de serialización y compresión de GET /orders/to-ship.
+
+Compara el camino anterior (response_model=List[dict] con JSONResponse: la
+lista se valida, se vuelve a volcar y pasa por json.dumps, sin compresión)
+con la app actual (filas directo a orjson y br/gzip negociado). Las filas se
+generan en memoria con las columnas por defecto de la vista; no usa la base
+de datos. Reporta el tiempo por request y los bytes del body tal como salen
+de la app.
+
+Uso (desde backend/):
+    python -m scripts.bench_api_serialization --rows 1000 --rows 10000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+from uuid import uuid4
+
+import httpx
+import orjson
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+
+from app.api.v1.orders import get_order_service
+from app.main import app
+from app.services.order_service import DEFAULT_LIST_FIELDS
+
+PATH = '/api/v1/orders/to-ship'
+
+def build_rows(count: int) -> List[dict]:
+    now = datetime.now(timezone.utc)
+    rows = []
+    for i in range(count):
+        platform = 'falabella' if i % 2 else 'mercadolibre'
+        row = {
+            'id': str(uuid4()),
+            'platform': platform,
+            'external_order_id': str(2000000000 + i),
+            'order_number': str(100000 + i),
+            'shipping_type': 'falabella_normal' if i % 2 else 'meli_flex',
+            'current_status': 'listo_despachar',
+            'customer_name': f'Cliente Prueba {i}',
+            'customer_phone': '+56900000000',
+            'customer_email': f'cliente{i}@example.com',
+            'total_amount': 19990.0 + i,
+            'items_count': 1 + i % 3,
+            'shipping_address': f'Av. Siempre Viva {i}, Depto {i % 50}',
+            'shipping_city': 'Santiago',
+            'shipping_region': 'Región Metropolitana',
+            'limite_despacho': (now + timedelta(minutes=i % 2880 - 720)).isoformat(),
+            'promised_delivery': (now + timedelta(days=2)).isoformat(),
+            'is_delayed': i % 7 == 0,
+            'created_at': (now - timedelta(minutes=i)).isoformat(),
+            'hours_delayed': round((i % 7) * 1.5, 2) if i % 7 == 0 else None,
+        }
+        rows.append({column: row.get(column) for column in DEFAULT_LIST_FIELDS['orders_to_ship']})
+    return rows
+
+class StubOrderService:
+    def __init__(self, rows: List[dict]):
+        self.rows = rows
+    
+    async def get_orders_to_ship(self, fields=None):
+        return self.rows
+
+def build_legacy_app(rows: List[dict]) -> FastAPI:
+    """El endpoint como estaba: response_model=List[dict], JSONResponse, sin compresión"""
+    legacy = FastAPI()
+    
+    @legacy.get(PATH, response_model=List[dict])
+    async def get_orders_to_ship():
+        return rows
+    
+    return legacy
+
+async def measure_requests(target, encoding: str, repeat: int):
+    """(ms por request, mediana; bytes del body) de GET PATH contra la app"""
+    transport = httpx.ASGITransport(app=target)
+    timings = []
+    size = 0
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            async with client.stream('GET', PATH, headers={'Accept-Encoding': encoding}) as response:
+                body = b''.join([chunk async for chunk in response.aiter_raw()])
+            timings.append(time.perf_counter() - start)
+            response.raise_for_status()
+            size = len(body)
+    return statistics.median(timings) * 1000, size
+
+def measure(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+def run(count: int, repeat: int):
+    rows = build_rows(count)
+    app.dependency_overrides[get_order_service] = lambda: StubOrderService(rows)
+    legacy = build_legacy_app(rows)
+    
+    print(f"\n{count} rows, median of {repeat}")
+    encoders = [
+        ('jsonable_encoder + json.dumps', lambda: json.dumps(jsonable_encoder(rows), ensure_ascii=False, separators=(',', ':')).encode()),
+        ('json.dumps', lambda: json.dumps(rows, ensure_ascii=False, separators=(',', ':')).encode()),
+        ('orjson.dumps', lambda: orjson.dumps(rows)),
+    ]
+    for name, fn in encoders:
+        print(f"  serializer {name:<30} {measure(fn, repeat):>8.1f} ms")
+    
+    cases = [
+        ('before, identity', legacy, 'identity'),
+        ('after, identity', app, 'identity'),
+        ('after, gzip', app, 'gzip'),
+        ('after, br', app, 'br'),
+    ]
+    for name, target, encoding in cases:
+        elapsed, size = asyncio.run(measure_requests(target, encoding, repeat))
+        print(f"  GET {PATH} {name:<17} {elapsed:>8.1f} ms {size:>12,} bytes")
+    app.dependency_overrides.clear()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, action='append', help='Repetible; por defecto 1000 y 10000')
+    parser.add_argument('--repeat', type=int, default=7)
+    args = parser.parse_args()
+    
+    for count in args.rows or [1000, 10000]:
+        run(count, args.repeat)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Stub que envía notificaciones de MercadoLibre al webhook local.
+
+Manda --resources recursos distintos (mitad orders_v2, mitad shipments),
+cada uno repetido --duplicates veces y en orden mezclado, como llegan
+desde ML. Muestra la latencia del ack y, después de --wait segundos, las
+estadísticas de la cola (aceptadas, coalescidas, procesadas).
+
+Uso (desde backend/, con la API corriendo):
+    python -m scripts.meli_notification_stub --resources 50 --duplicates 4
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import httpx
+
+from app.config import get_settings
+
+def build_notifications(resources: int, duplicates: int, user_id: str):
+    notifications = []
+    for i in range(resources):
+        if i % 2 == 0:
+            topic, resource = 'orders_v2', f"/orders/{2000000000 + i}"
+        else:
+            topic, resource = 'shipments', f"/shipments/{40000000000 + i}"
+        for attempt in range(1, duplicates + 1):
+            now = datetime.now(timezone.utc).isoformat()
+            notifications.append({
+                '_id': f"stub-{i}-{attempt}",
+                'resource': resource,
+                'user_id': user_id,
+                'topic': topic,
+                'application_id': 0,
+                'attempts': attempt,
+                'sent': now,
+                'received': now
+            })
+    random.shuffle(notifications)
+    return notifications
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='http://localhost:8000/api/v1/webhooks/mercadolibre')
+    parser.add_argument('--resources', type=int, default=50)
+    parser.add_argument('--duplicates', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--user-id', default=None, help='Por defecto MELI_USER_ID')
+    parser.add_argument('--wait', type=float, default=10.0, help='Segundos a esperar antes de leer las estadísticas')
+    args = parser.parse_args()
+    
+    user_id = args.user_id or get_settings().MELI_USER_ID
+    notifications = build_notifications(args.resources, args.duplicates, user_id)
+    
+    with httpx.Client(timeout=5) as client:
+        def post(notification):
+            start = time.perf_counter()
+            response = client.post(args.url, json=notification)
+            return (time.perf_counter() - start) * 1000, response.status_code, response.json().get('status')
+        
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(post, notifications))
+        
+        latencies = [latency for latency, _, _ in results]
+        outcomes = {}
+        for _, code, status in results:
+            key = f"{code} {status}"
+            outcomes[key] = outcomes.get(key, 0) + 1
+        
+        print(f"sent: {len(notifications)} notifications for {args.resources} resources")
+        print(f"ack latency: p50 {percentile(latencies, 0.5):.1f} ms, p99 {percentile(latencies, 0.99):.1f} ms")
+        print(f"responses: {outcomes}")
+        
+        if args.wait > 0:
+            time.sleep(args.wait)
+            stats = client.get(f"{args.url}/stats").json()
+            print(f"queue stats: {stats}")
+
+if __name__ == '__main__':
+    main()